@@ -0,0 +1,130 @@
+"""
+Compare latency, memory and output quality of the summarization backends.
+
+Usage:
+    python -m benchmarks.backends [transcript.txt] [--backends torch,torch-int8,onnx]
+                                 [--chunks 8] [--threads N]
+
+Each backend runs in its own process so that load time and peak memory are
+measured in isolation. Quality is the ROUGE-1/ROUGE-2 F1 overlap of each
+backend's summaries with those of the full-precision 'torch' backend, which
+therefore always runs first. Without a transcript file a synthetic one is used.
+"""
+import argparse
+import multiprocessing
+import resource
+import time
+from collections import Counter
+from typing import Any, Dict, List, Optional, Tuple
+
+from benchmarks.chunking import synthetic_transcript
+from summ import llm
+
+
+def ngrams(text: str, n: int) -> Counter:
+    words = text.lower().split()
+    return Counter(tuple(words[i:i + n]) for i in range(len(words) - n + 1))
+
+
+def rouge_f1(candidate: str, reference: str, n: int) -> float:
+    """ROUGE-n F1 of candidate against reference, on whitespace tokens."""
+    got, expected = ngrams(candidate, n), ngrams(reference, n)
+    overlap = sum((got & expected).values())
+    if not overlap:
+        return 0.0
+    precision = overlap / sum(got.values())
+    recall = overlap / sum(expected.values())
+    return 2 * precision * recall / (precision + recall)
+
+
+def run_backend(backend: str, chunks: List[str], threads: Optional[int],
+                results: Any) -> None:
+    """Load one backend in this (fresh) process and time summarizing the chunks."""
+    if threads is not None:
+        import torch
+        torch.set_num_threads(threads)
+
+    start = time.perf_counter()
+    summarizer = llm.get_summarizer(backend=backend)
+    load_seconds = time.perf_counter() - start
+    if summarizer is None:
+        results.put((backend, None))
+        return
+
+    # one warm-up call, the first inference pays for lazy initialization
+    summarizer(chunks[:1], max_length=50, min_length=15, do_sample=False, truncation=True)
+
+    latencies = []
+    summaries = []
+    for chunk in chunks:
+        start = time.perf_counter()
+        output = summarizer([chunk], max_length=50, min_length=15,
+                            do_sample=False, truncation=True)
+        latencies.append(time.perf_counter() - start)
+        summaries.append(output[0]['summary_text'])
+
+    results.put((backend, {
+        'load_seconds': load_seconds,
+        'latencies': latencies,
+        # ru_maxrss is in KiB on Linux
+        'peak_rss_mb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+        'summaries': summaries,
+    }))
+
+
+def measure(backend: str, chunks: List[str], threads: Optional[int]) -> Optional[Dict[str, Any]]:
+    context = multiprocessing.get_context('spawn')
+    results = context.Queue()
+    process = context.Process(target=run_backend, args=(backend, chunks, threads, results))
+    process.start()
+    _, result = results.get()
+    process.join()
+    return result
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('transcript', nargs='?')
+    parser.add_argument('--backends', default=','.join(llm.BACKENDS))
+    parser.add_argument('--chunks', type=int, default=8)
+    parser.add_argument('--threads', type=int)
+    args = parser.parse_args()
+
+    if args.transcript:
+        with open(args.transcript, encoding='utf8') as f:
+            text = f.read()
+    else:
+        text = synthetic_transcript()
+
+    from transformers import AutoTokenizer
+    tokenizer = AutoTokenizer.from_pretrained(llm.MODEL_NAME)
+    chunks = llm.token_chunking(text, tokenizer)[:args.chunks]
+
+    backends = [name for name in args.backends.split(',') if name != 'torch']
+    reference: Optional[List[str]] = None
+    rows: List[Tuple[str, Dict[str, Any]]] = []
+    for backend in ['torch'] + backends:
+        result = measure(backend, chunks, args.threads)
+        if result is None:
+            print(f'{backend:>11}: could not be loaded')
+            continue
+        if backend == 'torch':
+            reference = result['summaries']
+        rows.append((backend, result))
+
+    print(f'{len(chunks)} chunks of up to {llm.get_max_input_tokens(tokenizer)} tokens')
+    for backend, result in rows:
+        latencies = sorted(result['latencies'])
+        quality = ''
+        if reference is not None:
+            rouge1 = sum(rouge_f1(s, r, 1) for s, r in zip(result['summaries'], reference))
+            rouge2 = sum(rouge_f1(s, r, 2) for s, r in zip(result['summaries'], reference))
+            quality = (f', ROUGE-1 {rouge1 / len(chunks):.3f}'
+                       f' ROUGE-2 {rouge2 / len(chunks):.3f} vs torch')
+        print(f'{backend:>11}: load {result["load_seconds"]:6.1f} s, '
+              f'median {latencies[len(latencies) // 2] * 1000:7.0f} ms/chunk, '
+              f'peak RSS {result["peak_rss_mb"]:6.0f} MB{quality}')
+
+
+if __name__ == '__main__':
+    main()
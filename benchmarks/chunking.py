@@ -0,0 +1,85 @@
+"""
+Compare the character-based and token-aware chunkers.
+
+Usage:
+    python -m benchmarks.chunking [transcript.txt] [--summarize]
+
+Without a transcript file a synthetic one is generated. With --summarize
+the whole summarization is timed for both chunkers, which loads the model.
+"""
+import argparse
+import random
+import time
+from typing import Callable, List
+
+from transformers import AutoTokenizer
+
+from summ import llm
+
+
+WORDS = ('the model reads every caption and writes a short summary of what '
+         'was said in the video so that nobody has to watch it').split()
+
+
+def synthetic_transcript(sentences: int = 1500, seed: int = 0) -> str:
+    rng = random.Random(seed)
+    return ' '.join(
+        ' '.join(rng.choice(WORDS) for _ in range(rng.randint(6, 25))).capitalize() + '.'
+        for _ in range(sentences)
+    )
+
+
+def timed(fn: Callable[[], List[str]], repeat: int = 5) -> float:
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('transcript', nargs='?')
+    parser.add_argument('--summarize', action='store_true')
+    args = parser.parse_args()
+
+    if args.transcript:
+        with open(args.transcript, encoding='utf8') as f:
+            text = f.read()
+    else:
+        text = synthetic_transcript()
+
+    tokenizer = AutoTokenizer.from_pretrained(llm.MODEL_NAME)
+    max_tokens = llm.get_max_input_tokens(tokenizer)
+
+    candidates = {
+        'text_chunking': lambda: llm.text_chunking(text),
+        'token_chunking': lambda: llm.token_chunking(text, tokenizer),
+    }
+
+    print(f'transcript: {len(text)} chars, '
+          f'{len(tokenizer(text)["input_ids"])} tokens, window {max_tokens} tokens')
+    for name, chunker in candidates.items():
+        chunks = chunker()
+        lengths = [len(ids) for ids in tokenizer(chunks)['input_ids']]
+        print(f'{name:>15}: {len(chunks):4d} chunks, '
+              f'{sum(lengths) / len(lengths):6.0f} tokens/chunk avg, '
+              f'{sum(lengths):7d} tokens total, '
+              f'chunking {timed(chunker) * 1000:8.1f} ms')
+
+    if not args.summarize:
+        return
+
+    summarizer = llm.get_summarizer()
+    for name, chunker in candidates.items():
+        chunks = chunker()
+        start = time.perf_counter()
+        for batch in llm.make_batches([1] * len(chunks), 8):
+            summarizer([chunks[i] for i in batch], batch_size=len(batch),
+                       max_length=50, min_length=15, do_sample=False, truncation=True)
+        print(f'{name:>15}: summarized in {time.perf_counter() - start:8.1f} s')
+
+
+if __name__ == '__main__':
+    main()
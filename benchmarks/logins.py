@@ -0,0 +1,82 @@
+"""
+Measure logins per second under concurrency.
+
+Usage:
+    python -m benchmarks.logins [--method scrypt] [--concurrency 1,8,32]
+                               [--logins 200] [--workers 2] [--queue-depth 16]
+
+Runs against a throwaway database with a single user. Every client thread
+posts to /auth/login in a loop; a 503 means the hashing queue was full.
+"""
+import argparse
+import os
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Tuple
+
+from flask import Flask
+
+from summ import create_app
+from summ.db import get_db, init_db
+
+
+def make_app(method: str, workers: int, queue_depth: int, path: str) -> Flask:
+    app = create_app({
+        'TESTING': True,
+        'DATABASE': path,
+        'JOB_WORKERS': 0,
+        'PASSWORD_HASH_METHOD': method,
+        'HASH_WORKERS': workers,
+        'HASH_QUEUE_DEPTH': queue_depth,
+    })
+    with app.app_context():
+        init_db()
+        hasher = app.extensions['summ.hasher']
+        db = get_db()
+        db.execute("INSERT INTO user (username, password) VALUES ('bench', ?)",
+                   (hasher.hash('bench'),))
+        db.commit()
+    return app
+
+
+def run(app: Flask, concurrency: int, logins: int) -> Tuple[float, int, int]:
+    def login(_: int) -> int:
+        client = app.test_client()
+        return client.post('/auth/login',
+                           data={'username': 'bench', 'password': 'bench'}).status_code
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        statuses = list(executor.map(login, range(logins)))
+    elapsed = time.perf_counter() - start
+
+    return elapsed, statuses.count(302), statuses.count(503)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--method', default='scrypt')
+    parser.add_argument('--concurrency', default='1,8,32')
+    parser.add_argument('--logins', type=int, default=200)
+    parser.add_argument('--workers', type=int, default=2)
+    parser.add_argument('--queue-depth', type=int, default=16)
+    args = parser.parse_args()
+
+    fd, path = tempfile.mkstemp()
+    try:
+        app = make_app(args.method, args.workers, args.queue_depth, path)
+        print(f'{args.method}, {args.workers} hashing threads, queue depth {args.queue_depth}')
+        for concurrency in (int(c) for c in args.concurrency.split(',')):
+            elapsed, ok, busy = run(app, concurrency, args.logins)
+            print(f'{concurrency:4d} clients: {ok / elapsed:8.1f} logins/s, '
+                  f'{busy:4d} rejected with 503, {elapsed:6.2f} s total')
+    finally:
+        os.close(fd)
+        for suffix in ('', '-wal', '-shm'):
+            if os.path.exists(path + suffix):
+                os.unlink(path + suffix)
+
+
+if __name__ == '__main__':
+    main()
@@ -1,10 +1,9 @@
 import os
-from typing import Optional, Dict, Any, Union
+from typing import Optional, Dict, Any
 
 from flask import Flask
-from transformers import pipeline, Pipeline
 
-from . import db, auth, llm, summary
+from . import cache, db, auth, inference, jobs, summary
 
 
 def create_app(test_config: Optional[Dict[str, Any]] = None) -> Flask:
@@ -23,6 +22,48 @@ def create_app(test_config: Optional[Dict[str, Any]] = None) -> Flask:
     app.config.from_mapping(
         SECRET_KEY=os.getenv('SECRET_KEY', 'dev'),
         DATABASE=os.path.join(app.instance_path, 'summ.sqlite'),
+        DATABASE_POOL=True,
+        SQLITE_PRAGMAS=dict(db.DEFAULT_PRAGMAS),
+        INDEX_PAGE_SIZE=50,
+        # part of every page ETag, change it when a release changes the pages;
+        # None derives it from the templates
+        PAGE_ETAG_SALT=None,
+        # seconds between checks whether another process changed the categories
+        CATEGORY_CACHE_TTL=30,
+        # seconds a logged in user is served from memory before re-reading the user table
+        USER_CACHE_TTL=60,
+        USER_CACHE_MAX_USERS=1024,
+        # werkzeug generate_password_hash method, e.g. 'scrypt' or 'pbkdf2:sha256:600000';
+        # older hashes are upgraded at the next login
+        PASSWORD_HASH_METHOD='scrypt',
+        HASH_WORKERS=2,
+        # logins waiting for a hashing thread before new ones get a 503
+        HASH_QUEUE_DEPTH=16,
+        # 'torch', 'torch-int8' (dynamic quantization) or 'onnx' (needs optimum[onnxruntime])
+        SUMMARY_BACKEND='torch',
+        SUMMARY_BATCH_SIZE=8,
+        SUMMARY_MAX_BATCH_TOKENS=None,
+        SUMMARY_OVERLAP_TOKENS=50,
+        # condense section summaries into at most this many tokens, None joins them as is
+        SUMMARY_TARGET_TOKENS=200,
+        SUMMARY_MAX_MODEL_CALLS=128,
+        SUMMARY_MAP_WORKERS=1,
+        # model worker processes, 0 runs the model in the web process
+        INFERENCE_WORKERS=0,
+        # torch threads per worker, None for torch's default (or the pinned core count)
+        INFERENCE_THREADS=None,
+        INFERENCE_PIN_CORES=False,
+        # load the model in the background when serving, instead of on the first job
+        MODEL_PRELOAD=True,
+        # run one short inference after loading
+        MODEL_WARMUP=True,
+        JOB_WORKERS=1,
+        JOB_POLL_INTERVAL=5,
+        # seconds without a heartbeat after which a running job counts as abandoned
+        JOB_LEASE=60,
+        CACHE_PATH=os.path.join(app.instance_path, 'cache.sqlite'),
+        CACHE_TTL=7 * 24 * 60 * 60,
+        CACHE_MAX_BYTES=512 * 1024 * 1024,
     )
 
     if test_config is None:
@@ -38,12 +79,12 @@ def create_app(test_config: Optional[Dict[str, Any]] = None) -> Flask:
     except OSError:
         pass
 
-    app.model_pipeline: Union[Pipeline,
-                              None] = llm.get_summarizer()  # type: ignore
-
     db.init_app(app)
-    app.register_blueprint(auth.bp)
-    app.register_blueprint(summary.bp)
+    cache.init_app(app)
+    auth.init_app(app)
+    summary.init_app(app)
+    inference.init_app(app)
+    jobs.init_app(app)
     app.add_url_rule('/', endpoint='index')
 
     return app
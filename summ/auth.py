@@ -1,9 +1,16 @@
+import atexit
 import functools
-from typing import Callable, Optional, Any, Union
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, Optional, Any, Tuple, Union
 
 from flask import (
-    Blueprint, flash, g, redirect, render_template, request, session, url_for, Response
+    Blueprint, current_app, flash, g, redirect, render_template, request, session, url_for,
+    Response
 )
+from flask.app import Flask
 from werkzeug.security import check_password_hash, generate_password_hash
 
 from summ.db import get_db
@@ -11,6 +18,105 @@ from summ.db import get_db
 bp = Blueprint('auth', __name__, url_prefix='/auth')
 
 
+class UserCache:
+    """
+    In-process cache of logged in users' public fields, with expiry.
+
+    Entries only hold id and username, never the password hash. Other
+    processes see a logout or a deleted user once their entry expires. At
+    most max_size users are kept, the least recently set ones are dropped.
+    """
+
+    def __init__(self, ttl: float, max_size: int = 1024) -> None:
+        self.ttl = ttl
+        self.max_size = max_size
+        self._users: OrderedDict[int, Tuple[float, Dict[str, Any]]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, user_id: int) -> Optional[Dict[str, Any]]:
+        entry = self._users.get(user_id)
+        if entry is None or entry[0] <= time.monotonic():
+            return None
+        return entry[1]
+
+    def set(self, user: Dict[str, Any]) -> None:
+        now = time.monotonic()
+        with self._lock:
+            self._users[user['id']] = (now + self.ttl, user)
+            self._users.move_to_end(user['id'])
+            # entries are in expiry order, expired ones are all at the front
+            while self._users:
+                expires, _ = next(iter(self._users.values()))
+                if expires > now and len(self._users) <= self.max_size:
+                    break
+                self._users.popitem(last=False)
+
+    def __len__(self) -> int:
+        return len(self._users)
+
+    def invalidate(self, user_id: int) -> None:
+        with self._lock:
+            self._users.pop(user_id, None)
+
+
+class HasherBusy(Exception):
+    """Too many passwords are being hashed already."""
+
+
+class PasswordHasher:
+    """
+    Password hashing on a few dedicated threads, with a bounded queue.
+
+    Hashing is deliberately slow, so at most `workers` hashes run at once
+    (hashlib releases the GIL while hashing) and at most `queue_depth` more
+    wait for a thread. Beyond that, hash() and check() raise HasherBusy
+    instead of tying up yet another request thread.
+    """
+
+    def __init__(self, method: str, workers: int, queue_depth: int) -> None:
+        self.method = method
+        self._executor = ThreadPoolExecutor(max_workers=workers,
+                                            thread_name_prefix='summ-hasher')
+        self._slots = threading.BoundedSemaphore(workers + queue_depth)
+        self._method_prefix: Optional[Tuple[str, str]] = None
+
+    def _run(self, fn: Callable[..., Any], *args: Any) -> Any:
+        if not self._slots.acquire(blocking=False):
+            raise HasherBusy()
+        try:
+            return self._executor.submit(fn, *args).result()
+        finally:
+            self._slots.release()
+
+    def hash(self, password: str) -> str:
+        return self._run(generate_password_hash, password, self.method)
+
+    def check(self, pwhash: str, password: str) -> bool:
+        return self._run(check_password_hash, pwhash, password)
+
+    def needs_rehash(self, pwhash: str) -> bool:
+        """Whether a stored hash was made with other parameters than the configured ones."""
+        method = self.method
+        if self._method_prefix is None or self._method_prefix[0] != method:
+            # the method with werkzeug's defaults filled in, e.g. "scrypt:32768:8:1";
+            # hashed once in this thread, so it never takes a slot from a login
+            self._method_prefix = (method, generate_password_hash('', method).split('$', 1)[0])
+        return pwhash.split('$', 1)[0] != self._method_prefix[1]
+
+    def shutdown(self) -> None:
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+
+def get_hasher() -> PasswordHasher:
+    """Get the password hasher of the current application."""
+    return current_app.extensions['summ.hasher']
+
+
+def get_user_cache() -> UserCache:
+    """Get the user cache of the current application."""
+    return current_app.extensions['summ.users']
+
+
 @bp.route('/register', methods=('GET', 'POST'))
 def register() -> Union[str, Response]:
     if request.method == 'POST':
@@ -28,7 +134,7 @@ def register() -> Union[str, Response]:
             try:
                 db.execute(
                     "INSERT INTO user (username, password) VALUES (?, ?)",
-                    (username, generate_password_hash(password)),
+                    (username, get_hasher().hash(password)),
                 )
                 db.commit()
             except db.IntegrityError:
@@ -52,14 +158,22 @@ def login() -> Union[str, Response]:
             'SELECT * FROM user WHERE username = ?', (username,)
         ).fetchone()
 
+        hasher = get_hasher()
+
         if user is None:
             error = 'Incorrect username.'
-        elif not check_password_hash(user['password'], password):
+        elif not hasher.check(user['password'], password):
             error = 'Incorrect password.'
 
         if error is None:
+            if hasher.needs_rehash(user['password']):
+                # the password is at hand only now, upgrade its hash to the current method
+                db.execute('UPDATE user SET password = ? WHERE id = ?',
+                           (hasher.hash(password), user['id']))
+                db.commit()
             session.clear()
             session['user_id'] = user['id']
+            get_user_cache().set({'id': user['id'], 'username': user['username']})
             return redirect(url_for('index'))
 
         flash(error)
@@ -72,15 +186,28 @@ def load_logged_in_user() -> None:
     user_id = session.get('user_id')
 
     if user_id is None:
+        # anonymous requests never open a database connection
         g.user = None
-    else:
-        g.user = get_db().execute(
-            'SELECT * FROM user WHERE id = ?', (user_id,)
-        ).fetchone()
+        return
+
+    cache = get_user_cache()
+    g.user = cache.get(user_id)
+    if g.user is not None:
+        return
+
+    row = get_db().execute(
+        'SELECT id, username FROM user WHERE id = ?', (user_id,)
+    ).fetchone()
+    if row is not None:
+        g.user = dict(row)
+        cache.set(g.user)
 
 
 @bp.route('/logout')
 def logout() -> Response:
+    user_id = session.get('user_id')
+    if user_id is not None:
+        get_user_cache().invalidate(user_id)
     session.clear()
     return redirect(url_for('index'))
 
@@ -94,3 +221,22 @@ def login_required(view: Callable[..., Any]) -> Callable[..., Union[Response, An
         return view(**kwargs)
 
     return wrapped_view
+
+
+@bp.errorhandler(HasherBusy)
+def hasher_busy(e: HasherBusy) -> Tuple[str, int, Dict[str, str]]:
+    return 'Too many logins at once, please try again in a moment.', 503, {'Retry-After': '1'}
+
+
+def init_app(app: Flask) -> None:
+    """Create the user cache and password hasher, and register the auth blueprint."""
+    app.extensions['summ.users'] = UserCache(app.config['USER_CACHE_TTL'],
+                                             app.config['USER_CACHE_MAX_USERS'])
+    hasher = PasswordHasher(
+        app.config['PASSWORD_HASH_METHOD'],
+        workers=app.config['HASH_WORKERS'],
+        queue_depth=app.config['HASH_QUEUE_DEPTH'],
+    )
+    atexit.register(hasher.shutdown)
+    app.extensions['summ.hasher'] = hasher
+    app.register_blueprint(bp)
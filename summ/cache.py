@@ -0,0 +1,137 @@
+import json
+import sqlite3
+import time
+from typing import Any, Optional
+
+from flask import current_app
+from flask.app import Flask
+
+
+class DiskCache:
+    """
+    Size-bounded LRU cache with expiry, stored in an SQLite file.
+
+    Values must be JSON serializable. A connection is opened per operation,
+    so a single instance can be shared between threads (and pickled).
+    """
+
+    def __init__(self, path: str, ttl: float, max_bytes: int) -> None:
+        self.path = path
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self._initialized = False
+
+    def _connect(self) -> sqlite3.Connection:
+        db = sqlite3.connect(self.path, timeout=10)
+        if not self._initialized:
+            db.executescript(
+                'CREATE TABLE IF NOT EXISTS cache_entry ('
+                '  namespace TEXT NOT NULL,'
+                '  key TEXT NOT NULL,'
+                '  value TEXT NOT NULL,'
+                '  size INTEGER NOT NULL,'
+                '  expires_at REAL NOT NULL,'
+                '  accessed_at REAL NOT NULL,'
+                '  PRIMARY KEY (namespace, key)'
+                ');'
+                'CREATE INDEX IF NOT EXISTS idx_cache_entry_accessed_at'
+                '  ON cache_entry (accessed_at);'
+            )
+            self._initialized = True
+        return db
+
+    def get(self, namespace: str, key: str) -> Optional[Any]:
+        """Return the cached value, or None if it is missing or expired."""
+        now = time.time()
+        db = self._connect()
+        try:
+            with db:
+                row = db.execute(
+                    'SELECT value, expires_at FROM cache_entry WHERE namespace = ? AND key = ?',
+                    (namespace, key)
+                ).fetchone()
+                if row is None:
+                    return None
+
+                if row[1] <= now:
+                    db.execute(
+                        'DELETE FROM cache_entry WHERE namespace = ? AND key = ?',
+                        (namespace, key)
+                    )
+                    return None
+
+                db.execute(
+                    'UPDATE cache_entry SET accessed_at = ? WHERE namespace = ? AND key = ?',
+                    (now, namespace, key)
+                )
+                return json.loads(row[0])
+        finally:
+            db.close()
+
+    def set(self, namespace: str, key: str, value: Any) -> None:
+        """Store a value and evict the least recently used entries if over size."""
+        now = time.time()
+        data = json.dumps(value)
+        db = self._connect()
+        try:
+            with db:
+                db.execute(
+                    'INSERT OR REPLACE INTO cache_entry'
+                    ' (namespace, key, value, size, expires_at, accessed_at)'
+                    ' VALUES (?, ?, ?, ?, ?, ?)',
+                    (namespace, key, data, len(data), now + self.ttl, now)
+                )
+                self._evict(db, now)
+        finally:
+            db.close()
+
+    def delete(self, namespace: str, key: str) -> None:
+        db = self._connect()
+        try:
+            with db:
+                db.execute(
+                    'DELETE FROM cache_entry WHERE namespace = ? AND key = ?',
+                    (namespace, key)
+                )
+        finally:
+            db.close()
+
+    def clear(self) -> None:
+        db = self._connect()
+        try:
+            with db:
+                db.execute('DELETE FROM cache_entry')
+        finally:
+            db.close()
+
+    def _evict(self, db: sqlite3.Connection, now: float) -> None:
+        db.execute('DELETE FROM cache_entry WHERE expires_at <= ?', (now,))
+
+        total = db.execute('SELECT COALESCE(SUM(size), 0) FROM cache_entry').fetchone()[0]
+        if total <= self.max_bytes:
+            return
+
+        stale = []
+        for namespace, key, size in db.execute(
+                'SELECT namespace, key, size FROM cache_entry ORDER BY accessed_at'):
+            if total <= self.max_bytes:
+                break
+            stale.append((namespace, key))
+            total -= size
+
+        db.executemany(
+            'DELETE FROM cache_entry WHERE namespace = ? AND key = ?', stale)
+
+
+def get_cache() -> DiskCache:
+    """Get the cache of the current application."""
+    return current_app.extensions['summ.cache']
+
+
+def init_app(app: Flask) -> None:
+    """Create the application cache in the instance folder."""
+    app.extensions['summ.cache'] = DiskCache(
+        app.config['CACHE_PATH'],
+        ttl=app.config['CACHE_TTL'],
+        max_bytes=app.config['CACHE_MAX_BYTES'],
+    )
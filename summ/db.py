@@ -1,32 +1,164 @@
+import os
+import codecs
 import sqlite3
+import threading
+import zlib
 from datetime import datetime
-from typing import Optional
+from typing import Any, Dict, Iterator, List, Optional, Tuple
 
 import click
 from flask import current_app, g
 from flask.app import Flask
+from flask.cli import with_appcontext
+
+from summ.transcript import TranscriptSegments
+
+
+DEFAULT_PRAGMAS: Dict[str, Any] = {
+    # readers don't block the writer (and vice versa) with a write-ahead log
+    'journal_mode': 'WAL',
+    # with WAL this is still safe against corruption, only fsyncs at checkpoints
+    'synchronous': 'NORMAL',
+    'busy_timeout': 5000,
+    # negative values are in KiB
+    'cache_size': -16000,
+    'mmap_size': 256 * 1024 * 1024,
+}
+
+
+TRANSCRIPT_COMPRESSION_LEVEL: int = 6
+
+
+def compress_text(text: Optional[str]) -> Optional[bytes]:
+    """Compress text for storage in a BLOB column."""
+    if text is None:
+        return None
+    return zlib.compress(text.encode('utf8'), TRANSCRIPT_COMPRESSION_LEVEL)
+
+
+def decompress_text(data: Optional[bytes]) -> Optional[str]:
+    """Restore text stored with compress_text."""
+    if data is None:
+        return None
+    return zlib.decompress(data).decode('utf8')
+
+
+def connect(database: str, pragmas: Dict[str, Any]) -> sqlite3.Connection:
+    """Open a database connection and apply the configured pragmas."""
+    db = sqlite3.connect(
+        database,
+        detect_types=sqlite3.PARSE_DECLTYPES
+    )
+    db.row_factory = sqlite3.Row
+    # used by the search index triggers and the summary_document view
+    db.create_function('compress', 1, compress_text, deterministic=True)
+    db.create_function('decompress', 1, decompress_text, deterministic=True)
+
+    for name, value in pragmas.items():
+        db.execute(f'PRAGMA {name} = {value}')
+
+    return db
 
 
 def get_db() -> sqlite3.Connection:
     """Get or create a database connection."""
     if 'db' not in g:
-        g.db = sqlite3.connect(
-            current_app.config['DATABASE'],
-            detect_types=sqlite3.PARSE_DECLTYPES
-        )
-        g.db.row_factory = sqlite3.Row
+        if current_app.config['DATABASE_POOL']:
+            g.db = get_pooled_db()
+        else:
+            g.db = connect(current_app.config['DATABASE'],
+                           current_app.config['SQLITE_PRAGMAS'])
 
     return g.db
 
 
+def get_pooled_db() -> sqlite3.Connection:
+    """Get the connection kept open for the current thread."""
+    pool: threading.local = current_app.extensions['summ.db']
+    db = getattr(pool, 'db', None)
+
+    if db is None:
+        db = pool.db = connect(current_app.config['DATABASE'],
+                               current_app.config['SQLITE_PRAGMAS'])
+
+    return db
+
+
 def close_db(e: Optional[Exception] = None) -> None:
-    """Close the database connection."""
+    """Close the database connection, or release it back to the pool."""
     db = g.pop('db', None)
 
-    if db is not None:
+    if db is None:
+        return
+
+    if current_app.config['DATABASE_POOL']:
+        # don't leak a half-finished transaction into the next request
+        if db.in_transaction:
+            db.rollback()
+    else:
         db.close()
 
 
+def get_cache_versions() -> Dict[str, int]:
+    """Current change counters of the cache_version table, by name."""
+    return {row['name']: row['version'] for row in get_db().execute(
+        'SELECT name, version FROM cache_version')}
+
+
+def get_transcript_text(summary_id: int) -> Optional[str]:
+    """Load and decompress the transcript of a summary."""
+    row = get_db().execute(
+        'SELECT body FROM summary_transcript WHERE summary_id = ?', (summary_id,)
+    ).fetchone()
+    return decompress_text(row['body']) if row else None
+
+
+def get_transcript_segments(summary_id: int) -> Optional[TranscriptSegments]:
+    """Load the timed segments of a summary's transcript, if they were stored."""
+    row = get_db().execute(
+        'SELECT body, timings FROM summary_transcript WHERE summary_id = ?', (summary_id,)
+    ).fetchone()
+    if row is None or row['timings'] is None:
+        return None
+    return TranscriptSegments.from_bytes(decompress_text(row['body']),
+                                         zlib.decompress(row['timings']))
+
+
+def iter_transcript_text(summary_id: int, chunk_size: int = 64 * 1024) -> Iterator[str]:
+    """Decompress the transcript of a summary piece by piece, for streaming."""
+    row = get_db().execute(
+        'SELECT body FROM summary_transcript WHERE summary_id = ?', (summary_id,)
+    ).fetchone()
+    if row is None:
+        return
+
+    decompressor = zlib.decompressobj()
+    decoder = codecs.getincrementaldecoder('utf8')()
+    data = row['body']
+
+    while data:
+        text = decoder.decode(decompressor.decompress(data, chunk_size))
+        if text:
+            yield text
+        data = decompressor.unconsumed_tail
+
+    text = decoder.decode(decompressor.flush(), final=True)
+    if text:
+        yield text
+
+
+def list_migrations() -> List[Tuple[int, str]]:
+    """Return (version, file name) of every migration script, in order."""
+    names = os.listdir(os.path.join(current_app.root_path, 'migrations'))
+    return sorted((int(name.split('_', 1)[0]), name)
+                  for name in names if name.endswith('.sql'))
+
+
+def get_schema_version(db: sqlite3.Connection) -> int:
+    """Get the version of the last migration applied to the database."""
+    return db.execute('PRAGMA user_version').fetchone()[0]
+
+
 def init_db() -> None:
     """Initialize the database with schema from schema.sql."""
     db = get_db()
@@ -34,6 +166,40 @@ def init_db() -> None:
     with current_app.open_resource('schema.sql') as f:
         db.executescript(f.read().decode('utf8'))
 
+    # schema.sql already contains every migration
+    migrations = list_migrations()
+    db.execute(f'PRAGMA user_version = {migrations[-1][0] if migrations else 0}')
+
+
+def migrate_db() -> List[str]:
+    """Apply pending migrations to the database, returning their names."""
+    # imported here so that plain database access doesn't load the llm module
+    from summ.llm import extract_video_id
+
+    db = get_db()
+    db.create_function('extract_video_id', 1, extract_video_id, deterministic=True)
+
+    applied: List[str] = []
+    for version, name in list_migrations():
+        if version <= get_schema_version(db):
+            continue
+
+        with current_app.open_resource(f'migrations/{name}') as f:
+            script = f.read().decode('utf8')
+
+        # each migration and its version bump are applied atomically
+        try:
+            db.executescript(
+                f'BEGIN;\n{script}\nPRAGMA user_version = {version};\nCOMMIT;')
+        except sqlite3.Error:
+            if db.in_transaction:
+                db.rollback()
+            raise
+
+        applied.append(name)
+
+    return applied
+
 
 @click.command('init-db')
 def init_db_command() -> None:
@@ -42,6 +208,17 @@ def init_db_command() -> None:
     click.echo('Initialized the database.')
 
 
+@click.command('migrate-db')
+@with_appcontext
+def migrate_db_command() -> None:
+    """Apply pending schema migrations without losing data."""
+    applied = migrate_db()
+
+    for name in applied:
+        click.echo(f'Applied {name}.')
+    click.echo('Database is up to date.')
+
+
 sqlite3.register_converter(
     "timestamp",
     # type: Callable[[bytes], datetime]
@@ -51,5 +228,8 @@ sqlite3.register_converter(
 
 def init_app(app: Flask) -> None:
     """Initialize application with database teardown and CLI command."""
+    # connections are per thread, so the pool never shares one between threads
+    app.extensions['summ.db'] = threading.local()
     app.teardown_appcontext(close_db)
     app.cli.add_command(init_db_command)
+    app.cli.add_command(migrate_db_command)
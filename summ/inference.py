@@ -0,0 +1,294 @@
+import atexit
+import multiprocessing
+import os
+import queue
+import threading
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, List, Optional, Set, Tuple, Union
+
+import click
+from flask import Blueprint, current_app, jsonify, Response
+from flask.app import Flask
+
+from summ import llm
+from summ.transcript import SectionSummary, TranscriptSegments
+
+bp = Blueprint('inference', __name__)
+
+# model of this worker process, set by _init_worker
+_worker_model: Tuple[str, str] = (llm.MODEL_NAME, 'torch')
+
+
+def split_cores(cores: Set[int], count: int) -> List[Set[int]]:
+    """Split the usable cores into count contiguous groups of (nearly) equal size."""
+    ordered = sorted(cores)
+    if count <= 0 or len(ordered) < count:
+        return []
+
+    size, extra = divmod(len(ordered), count)
+    groups: List[Set[int]] = []
+    start = 0
+    for i in range(count):
+        end = start + size + (1 if i < extra else 0)
+        groups.append(set(ordered[start:end]))
+        start = end
+    return groups
+
+
+def _init_worker(model_name: str, backend: str, num_threads: Optional[int],
+                 core_sets: Any, warmup: bool) -> None:
+    """Configure a freshly spawned worker process and load its model."""
+    global _worker_model
+    _worker_model = (model_name, backend)
+
+    cores = None
+    if core_sets is not None:
+        try:
+            cores = core_sets.get_nowait()
+        except queue.Empty:
+            # a replacement for a dead worker, the core sets were all handed out
+            cores = None
+    if cores:
+        os.sched_setaffinity(0, cores)
+        if num_threads is None:
+            num_threads = len(cores)
+
+    if num_threads is not None:
+        import torch
+        torch.set_num_threads(num_threads)
+
+    summarizer = llm.get_summarizer(model_name, backend)
+    if summarizer is not None and warmup:
+        llm.warm_up(summarizer)
+
+
+def _check_worker() -> bool:
+    return llm.get_summarizer(*_worker_model) is not None
+
+
+def _summarize_segments(segments: TranscriptSegments,
+                        kwargs: Any) -> Optional[List[SectionSummary]]:
+    return llm.summarize_segments(
+        segments, summarizer=llm.get_summarizer(*_worker_model), **kwargs)
+
+
+def _reduce_summaries(summaries: List[str], target_tokens: int,
+                      kwargs: Any) -> Tuple[str, bool]:
+    return llm.reduce_summaries(
+        summaries, llm.get_summarizer(*_worker_model), target_tokens, **kwargs)
+
+
+class LocalInference:
+    """
+    The summarization model in this process.
+
+    The model is loaded in a background thread by start(), or on first use,
+    so that starting the app never waits for it.
+    """
+
+    def __init__(self, model_name: str = llm.MODEL_NAME, backend: str = 'torch',
+                 warmup: bool = False) -> None:
+        self.model_name = model_name
+        self.backend = backend
+        self.warmup = warmup
+        self.status = 'idle'
+        self.summarizer: Optional[Any] = None
+        self._lock = threading.Lock()
+        self._load_lock = threading.Lock()
+
+    def start(self) -> None:
+        """Load the model in a background thread, unless it is loaded or loading."""
+        with self._lock:
+            if self.status in ('loading', 'ready'):
+                return
+            self.status = 'loading'
+
+        threading.Thread(target=self.load, name='summ-model-loader', daemon=True).start()
+
+    def load(self) -> Optional[Any]:
+        """Load (and warm up) the model now, or wait for the load in progress."""
+        with self._load_lock:
+            if self.summarizer is not None:
+                return self.summarizer
+
+            self.status = 'loading'
+            summarizer = llm.get_summarizer(self.model_name, self.backend)
+            if summarizer is not None and self.warmup:
+                llm.warm_up(summarizer)
+
+            self.summarizer = summarizer
+            # a failed load is retried by the next job
+            self.status = 'ready' if summarizer is not None else 'failed'
+            return summarizer
+
+    def summarize_segments(self, segments: TranscriptSegments,
+                           **kwargs: Any) -> Optional[List[SectionSummary]]:
+        summarizer = self.load()
+        if summarizer is None:
+            return None
+        return llm.summarize_segments(segments, summarizer=summarizer, **kwargs)
+
+    def reduce_summaries(self, summaries: List[str], target_tokens: int,
+                         **kwargs: Any) -> Tuple[str, bool]:
+        summarizer = self.summarizer
+        if summarizer is not None:
+            return llm.reduce_summaries(summaries, summarizer, target_tokens, **kwargs)
+        # summaries that already fit (e.g. all sections came from the cache) need no model
+        return llm.reduce_summaries(
+            summaries, None, target_tokens, tokenizer=llm.get_tokenizer(self.model_name),
+            load_summarizer=self.load, **kwargs)
+
+
+class InferencePool:
+    """
+    Summarization models running in their own worker processes.
+
+    Each worker loads the model once and gets its own torch thread count and,
+    optionally, its own set of cores, so concurrent jobs don't fight over the
+    GIL or the same intra-op threads. Work is sent over the executor's queues;
+    processes are spawned on first use, so CLI commands never start them.
+    """
+
+    def __init__(self, count: int, model_name: str = llm.MODEL_NAME, backend: str = 'torch',
+                 num_threads: Optional[int] = None, pin_cores: bool = False,
+                 warmup: bool = False) -> None:
+        self.count = count
+        self.model_name = model_name
+        self.backend = backend
+        self.num_threads = num_threads
+        self.pin_cores = pin_cores and hasattr(os, 'sched_setaffinity')
+        self.warmup = warmup
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._checks: List[Future] = []
+        self._lock = threading.Lock()
+
+    @property
+    def status(self) -> str:
+        """'idle' before start(), then 'loading' until every worker has its model."""
+        checks = self._checks
+        if not checks:
+            return 'idle'
+        if not all(check.done() for check in checks):
+            return 'loading'
+        if all(check.exception() is None and check.result() for check in checks):
+            return 'ready'
+        return 'failed'
+
+    def start(self) -> None:
+        """Spawn the worker processes, which load their model while starting."""
+        executor = self._get_executor()
+        with self._lock:
+            if self._checks and self.status != 'failed':
+                return
+            self._checks = [executor.submit(_check_worker) for _ in range(self.count)]
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        with self._lock:
+            if self._executor is None:
+                # fork would copy the Flask app, its threads and open sqlite handles
+                context = multiprocessing.get_context('spawn')
+                core_sets = None
+                if self.pin_cores:
+                    groups = split_cores(os.sched_getaffinity(0), self.count)
+                    if groups:
+                        core_sets = context.Queue()
+                        for group in groups:
+                            core_sets.put(group)
+
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.count,
+                    mp_context=context,
+                    initializer=_init_worker,
+                    initargs=(self.model_name, self.backend, self.num_threads, core_sets,
+                              self.warmup),
+                )
+            return self._executor
+
+    def _submit(self, fn: Any, *args: Any) -> Any:
+        executor = self._get_executor()
+        try:
+            return executor.submit(fn, *args).result()
+        except BrokenProcessPool:
+            # a worker died (e.g. out of memory), start a fresh pool for the next job
+            with self._lock:
+                if self._executor is executor:
+                    self._executor = None
+                    self._checks = []
+            executor.shutdown(wait=False, cancel_futures=True)
+            raise
+
+    def summarize_segments(self, segments: TranscriptSegments,
+                           **kwargs: Any) -> Optional[List[SectionSummary]]:
+        return self._submit(_summarize_segments, segments, kwargs)
+
+    def reduce_summaries(self, summaries: List[str], target_tokens: int,
+                         **kwargs: Any) -> Tuple[str, bool]:
+        return self._submit(_reduce_summaries, summaries, target_tokens, kwargs)
+
+    def shutdown(self) -> None:
+        with self._lock:
+            executor, self._executor = self._executor, None
+            self._checks = []
+        if executor is not None:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+
+def get_inference() -> Union[LocalInference, InferencePool]:
+    """Get where the current application runs its model."""
+    return current_app.extensions['summ.inference']
+
+
+def summarize_segments(segments: TranscriptSegments,
+                       **kwargs: Any) -> Optional[List[SectionSummary]]:
+    """Summarize transcript sections in the inference pool, or in this process without one."""
+    return get_inference().summarize_segments(segments, **kwargs)
+
+
+def reduce_summaries(summaries: List[str], target_tokens: int,
+                     **kwargs: Any) -> Tuple[str, bool]:
+    """Condense summaries in the inference pool, or in this process without one."""
+    return get_inference().reduce_summaries(summaries, target_tokens, **kwargs)
+
+
+@bp.route('/ready', methods=('GET',))
+def ready() -> Tuple[Response, int]:
+    """Readiness probe: 200 once the model can serve jobs, 503 until then."""
+    inference = get_inference()
+    # asking means the model is wanted, even if preloading is off
+    inference.start()
+    status = inference.status
+    return jsonify({'status': status}), 200 if status == 'ready' else 503
+
+
+def start_inference() -> None:
+    """Start loading the model when the app serves its first request."""
+    get_inference().start()
+
+
+def init_app(app: Flask) -> None:
+    """Set up where the model runs and, unless testing, start loading it."""
+    config = app.config
+    inference: Union[LocalInference, InferencePool]
+    if config['INFERENCE_WORKERS'] > 0:
+        inference = InferencePool(
+            config['INFERENCE_WORKERS'],
+            backend=config['SUMMARY_BACKEND'],
+            num_threads=config['INFERENCE_THREADS'],
+            pin_cores=config['INFERENCE_PIN_CORES'],
+            warmup=config['MODEL_WARMUP'],
+        )
+        atexit.register(inference.shutdown)
+    else:
+        inference = LocalInference(backend=config['SUMMARY_BACKEND'],
+                                   warmup=config['MODEL_WARMUP'])
+    app.extensions['summ.inference'] = inference
+
+    if config['MODEL_PRELOAD'] and not app.testing:
+        if click.get_current_context(silent=True) is None:
+            # served without the flask command (e.g. by waitress), load right away
+            inference.start()
+        # under `flask run` the first request starts it, other commands never do
+        app.before_request(start_inference)
+
+    app.register_blueprint(bp)
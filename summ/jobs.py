@@ -0,0 +1,377 @@
+import sqlite3
+import threading
+import time
+import zlib
+from dataclasses import asdict
+from typing import List, Optional, Set, Union
+
+from flask import (
+    Blueprint, Flask, current_app, g, jsonify, render_template, request, Response
+)
+from werkzeug.exceptions import abort
+
+from summ.auth import login_required
+from summ.cache import get_cache
+from summ.db import TRANSCRIPT_COMPRESSION_LEVEL, compress_text, get_db
+from summ.inference import reduce_summaries, summarize_segments
+from summ.llm import VideoMetadata, fetch_transcript_segments, get_video_metadata
+from summ.transcript import TranscriptSegments
+
+bp = Blueprint('jobs', __name__, url_prefix='/jobs')
+
+
+class JobError(Exception):
+    """A summarization job could not be completed."""
+
+
+class JobWorkers:
+    """
+    Background threads that drain queued jobs from the job table.
+
+    A running job holds a lease, its updated_at, which this process renews
+    while it runs the job. Jobs whose lease expired were left behind by a
+    process that died, and are put back in the queue; jobs of other live
+    processes are never touched.
+    """
+
+    def __init__(self, app: Flask, count: int, poll_interval: float, lease: float) -> None:
+        self.app = app
+        self.count = count
+        self.poll_interval = poll_interval
+        self.lease = lease
+        self._running: Set[int] = set()
+        self._threads: List[threading.Thread] = []
+        self._wakeup = threading.Event()
+        self._lock = threading.Lock()
+
+    def start(self) -> None:
+        """Start the worker threads, once per application."""
+        if self._threads:
+            return
+
+        with self._lock:
+            if self._threads:
+                return
+
+            with self.app.app_context():
+                requeue_interrupted_jobs(self.lease)
+
+            for i in range(self.count):
+                thread = threading.Thread(
+                    target=self._run, name=f'summ-job-worker-{i}', daemon=True)
+                thread.start()
+                self._threads.append(thread)
+
+            thread = threading.Thread(
+                target=self._heartbeat, name='summ-job-heartbeat', daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def notify(self) -> None:
+        """Wake up idle workers after a job was queued."""
+        self._wakeup.set()
+
+    def _run(self) -> None:
+        while True:
+            if self._run_once():
+                continue
+
+            if self._wakeup.wait(self.poll_interval):
+                self._wakeup.clear()
+
+    def _run_once(self) -> bool:
+        """Claim and run one job, returning whether there was one."""
+        with self.app.app_context():
+            job_id = None
+            try:
+                job_id = claim_job()
+                if job_id is None:
+                    return False
+                self._running.add(job_id)
+                try:
+                    run_job(job_id)
+                finally:
+                    self._running.discard(job_id)
+            except Exception:
+                # e.g. "database is locked" while recording the outcome, which
+                # must not end the worker thread; without renewals the job's
+                # lease runs out and it is queued again
+                self.app.logger.exception('Error running job %s', job_id)
+                get_db().rollback()
+            return job_id is not None
+
+    def _heartbeat(self) -> None:
+        """Renew the leases of the running jobs and take over expired ones."""
+        while True:
+            time.sleep(self.lease / 3)
+            with self.app.app_context():
+                try:
+                    renew_jobs(list(self._running))
+                except sqlite3.Error:
+                    self.app.logger.exception('Error renewing job leases')
+                    get_db().rollback()
+                requeue_interrupted_jobs(self.lease)
+
+
+def renew_jobs(job_ids: List[int]) -> None:
+    """Extend the lease of jobs this process is running."""
+    if not job_ids:
+        return
+    db = get_db()
+    placeholders = ', '.join('?' * len(job_ids))
+    db.execute(
+        "UPDATE job SET updated_at = CURRENT_TIMESTAMP"
+        f" WHERE status = 'running' AND id IN ({placeholders})",
+        job_ids
+    )
+    db.commit()
+
+
+def requeue_interrupted_jobs(lease: float) -> None:
+    """Put running jobs whose lease expired, as their process died, back in the queue."""
+    db = get_db()
+    try:
+        db.execute(
+            "UPDATE job SET status = 'queued', updated_at = CURRENT_TIMESTAMP"
+            " WHERE status = 'running' AND updated_at < datetime('now', ?)",
+            (f'-{lease} seconds',)
+        )
+        db.commit()
+    except sqlite3.OperationalError as e:
+        # the database has not been initialized yet, or is locked
+        current_app.logger.warning('Error requeueing jobs: %s', e)
+        db.rollback()
+
+
+def claim_job(job_id: Optional[int] = None) -> Optional[int]:
+    """Atomically mark a queued job as running and return its id."""
+    db = get_db()
+    try:
+        if job_id is None:
+            row = db.execute(
+                "UPDATE job SET status = 'running', updated_at = CURRENT_TIMESTAMP"
+                " WHERE id = (SELECT id FROM job WHERE status = 'queued' ORDER BY id LIMIT 1)"
+                " RETURNING id"
+            ).fetchone()
+        else:
+            row = db.execute(
+                "UPDATE job SET status = 'running', updated_at = CURRENT_TIMESTAMP"
+                " WHERE id = ? AND status = 'queued' RETURNING id",
+                (job_id,)
+            ).fetchone()
+        db.commit()
+    except sqlite3.OperationalError as e:
+        current_app.logger.warning('Error claiming job: %s', e)
+        db.rollback()
+        return None
+
+    return row['id'] if row else None
+
+
+def find_summary(video_id: str) -> Optional[sqlite3.Row]:
+    """Find an existing summary of a video."""
+    return get_db().execute(
+        'SELECT id, yt_title FROM summary WHERE video_id = ?', (video_id,)
+    ).fetchone()
+
+
+def find_pending_job(video_id: str) -> Optional[sqlite3.Row]:
+    """Find a queued or running job for a video."""
+    return get_db().execute(
+        "SELECT id, author_id FROM job WHERE video_id = ? AND status IN ('queued', 'running')"
+        " ORDER BY id LIMIT 1",
+        (video_id,)
+    ).fetchone()
+
+
+def enqueue_job(yt_url: str, video_id: str, author_id: int, category_id: int) -> int:
+    """Queue a video for summarization and return the job id."""
+    db = get_db()
+    job_id = db.execute(
+        'INSERT INTO job (yt_url, video_id, author_id, category_id) VALUES (?, ?, ?, ?)',
+        (yt_url, video_id, author_id, category_id)
+    ).lastrowid
+    db.commit()
+
+    workers: Optional[JobWorkers] = current_app.extensions['summ.jobs']
+    if workers is None:
+        # no background workers configured, run the job in this request
+        if claim_job(job_id) is not None:
+            run_job(job_id)
+    else:
+        workers.notify()
+
+    return job_id
+
+
+def load_metadata(video_id: str, url: str) -> VideoMetadata:
+    """Get the video page metadata, from the cache when possible."""
+    cache = get_cache()
+    cached = cache.get('metadata', video_id)
+    if cached is not None:
+        return VideoMetadata(**cached)
+
+    metadata = get_video_metadata(url)
+    if metadata is None or metadata.title is None:
+        raise JobError('Could not get the video details from YouTube.')
+
+    cache.set('metadata', video_id, asdict(metadata))
+    return metadata
+
+
+def load_transcript(video_id: str) -> TranscriptSegments:
+    """Get the timed video transcript, from the cache when possible."""
+    cache = get_cache()
+    cached = cache.get('segments', video_id)
+    if cached is not None:
+        return TranscriptSegments.from_dict(cached)
+
+    try:
+        segments = fetch_transcript_segments(video_id)
+    except Exception as e:
+        raise JobError(f'Could not get the video transcript: {e}')
+
+    cache.set('segments', video_id, segments.to_dict())
+    return segments
+
+
+def create_summary(job: sqlite3.Row) -> int:
+    """
+    Fetch, summarize and store the video of a job, returning the summary id.
+
+    The summary is not committed, so that it is stored together with the
+    outcome of its job or not at all.
+    """
+    db = get_db()
+
+    vid_id = job['video_id']
+    existing = find_summary(vid_id)
+    if existing is not None:
+        raise JobError(f'A summary for "{existing["yt_title"]}" already exists.')
+
+    metadata = load_metadata(vid_id, job['yt_url'])
+    yt_title = metadata.title
+    yt_channel_name = metadata.channel_name
+    segments = load_transcript(vid_id)
+    config = current_app.config
+    max_calls = config['SUMMARY_MAX_MODEL_CALLS']
+    sections = summarize_segments(
+        segments,
+        batch_size=config['SUMMARY_BATCH_SIZE'],
+        max_batch_tokens=config['SUMMARY_MAX_BATCH_TOKENS'],
+        overlap_tokens=config['SUMMARY_OVERLAP_TOKENS'],
+        cache=get_cache(),
+        max_calls=max_calls,
+        workers=config['SUMMARY_MAP_WORKERS'],
+        backend=config['SUMMARY_BACKEND'])
+    if sections is None:
+        raise JobError('Could not load the summarization model.')
+
+    section_texts = [section.summary_text for section in sections]
+    if config['SUMMARY_TARGET_TOKENS'] is None:
+        summary_text = ' '.join(section_texts)
+    else:
+        summary_text, _ = reduce_summaries(
+            section_texts,
+            config['SUMMARY_TARGET_TOKENS'],
+            max_calls=None if max_calls is None else max_calls - len(sections),
+            batch_size=config['SUMMARY_BATCH_SIZE'],
+            max_batch_tokens=config['SUMMARY_MAX_BATCH_TOKENS'],
+            workers=config['SUMMARY_MAP_WORKERS'])
+
+    try:
+        summary_id = db.execute(
+            'INSERT INTO summary (summary_text, yt_url, yt_title, video_id, yt_channel_name, author_id, category_id)'
+            ' VALUES (?, ?, ?, ?, ?, ?, ?)',
+            (summary_text, job['yt_url'], yt_title, vid_id, yt_channel_name,
+             job['author_id'], job['category_id'])
+        ).lastrowid
+        db.execute(
+            'INSERT INTO summary_transcript (summary_id, body, timings) VALUES (?, ?, ?)',
+            (summary_id, compress_text(segments.text),
+             zlib.compress(segments.timings_to_bytes(), TRANSCRIPT_COMPRESSION_LEVEL))
+        )
+        db.executemany(
+            'INSERT INTO summary_section (summary_id, position, start_time, end_time, summary_text)'
+            ' VALUES (?, ?, ?, ?, ?)',
+            [(summary_id, position, section.start, section.end, section.summary_text)
+             for position, section in enumerate(sections)]
+        )
+    except sqlite3.IntegrityError:
+        db.rollback()
+        raise JobError(f'A summary for "{yt_title}" already exists.')
+
+    return summary_id
+
+
+def run_job(job_id: int) -> None:
+    """Run a claimed job and record its outcome."""
+    db = get_db()
+    job = db.execute('SELECT * FROM job WHERE id = ?', (job_id,)).fetchone()
+
+    try:
+        summary_id = create_summary(job)
+    except Exception as e:
+        db.rollback()
+        db.execute(
+            "UPDATE job SET status = 'failed', error = ?, updated_at = CURRENT_TIMESTAMP"
+            " WHERE id = ?",
+            (str(e), job_id)
+        )
+    else:
+        db.execute(
+            "UPDATE job SET status = 'done', summary_id = ?, updated_at = CURRENT_TIMESTAMP"
+            " WHERE id = ?",
+            (summary_id, job_id)
+        )
+    db.commit()
+
+
+def get_job(id: int) -> sqlite3.Row:
+    job = get_db().execute('SELECT * FROM job WHERE id = ?', (id,)).fetchone()
+
+    if job is None:
+        abort(404, f"Job id {id} doesn't exist.")
+
+    if job['author_id'] != g.user['id']:
+        abort(403)
+
+    return job
+
+
+@bp.route('/<int:id>', methods=('GET',))
+@login_required
+def status(id: int) -> Union[str, Response]:
+    job = get_job(id)
+
+    if request.accept_mimetypes.best == 'application/json':
+        return jsonify({
+            'id': job['id'],
+            'yt_url': job['yt_url'],
+            'status': job['status'],
+            'error': job['error'],
+            'summary_id': job['summary_id'],
+            'created_at': job['created_at'].isoformat(),
+            'updated_at': job['updated_at'].isoformat(),
+        })
+
+    return render_template('jobs/status.html', job=job)
+
+
+def start_workers() -> None:
+    """Start the background workers when the app serves its first request."""
+    workers: Optional[JobWorkers] = current_app.extensions['summ.jobs']
+    if workers is not None:
+        workers.start()
+
+
+def init_app(app: Flask) -> None:
+    """Set up the job workers and register the status blueprint."""
+    count = app.config['JOB_WORKERS']
+    app.extensions['summ.jobs'] = (
+        JobWorkers(app, count, app.config['JOB_POLL_INTERVAL'], app.config['JOB_LEASE'])
+        if count > 0 else None
+    )
+    # workers start on the first request so that CLI commands never run jobs
+    app.before_request(start_workers)
+    app.register_blueprint(bp)
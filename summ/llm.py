@@ -1,41 +1,147 @@
 from youtube_transcript_api import YouTubeTranscriptApi
-from transformers import Pipeline, pipeline
+from requests.adapters import HTTPAdapter
+from dataclasses import asdict, dataclass
+import codecs
+import hashlib
+import json
 import re
 import requests
-import torch
 import html
-from typing import Optional, List
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import TYPE_CHECKING, Any, Callable, Dict, NamedTuple, Optional, List, Tuple, Union
+
+from summ.transcript import SectionSummary, TranscriptChunk, TranscriptSegments
+
+# torch and transformers take seconds to import, so they are only imported
+# where a model is loaded; importing summ (for the web pages or the CLI) never does
+if TYPE_CHECKING:
+    from transformers import Pipeline
+
+    from summ.cache import DiskCache
 
 
 MODEL_NAME: str = 'facebook/bart-large-cnn'
+DEFAULT_MAX_INPUT_TOKENS: int = 1024
+SENTENCE_END = re.compile(r'(?<=[.!?])\s+')
 
+# (connect, read) timeouts for requests to YouTube, in seconds
+HTTP_TIMEOUT: Tuple[float, float] = (5, 15)
+METADATA_CHUNK_SIZE: int = 64 * 1024
+METADATA_MAX_CHARS: int = 4 * 1024 * 1024
+PLAYER_RESPONSE_END: str = 'var ytInitialData'
+METADATA_PATTERNS: Dict[str, re.Pattern] = {
+    'title': re.compile(r'<title>(.*?) - YouTube</title>'),
+    'channel_name': re.compile(r'"(?:ownerChannelName|channelName)":"(.*?)"'),
+    'duration': re.compile(r'"lengthSeconds":"(\d+)"'),
+    'language': re.compile(r'"captionTracks":\[\{[^\]]*?"languageCode":"([\w-]+)"'),
+}
 
-def get_youtube_title(url: str) -> Optional[str]:
-    """Get YouTube video title from an URL"""
+WARMUP_TEXT: str = ('The model reads the captions of a video and writes a short summary '
+                    'of what was said, so that nobody has to watch the whole video.')
+
+# Bump when a change to the summarization code changes its output
+SUMMARY_CACHE_VERSION: int = 1
+
+# Loaded pipelines, keyed by (model name, device, backend), shared by the whole process
+_summarizers: Dict[Tuple[str, str, str], 'Pipeline'] = {}
+_summarizers_lock = threading.Lock()
+_tokenizers: Dict[str, Any] = {}
+
+_summary_cache_stats: Dict[str, int] = {'hits': 0, 'misses': 0}
+_summary_cache_lock = threading.Lock()
+
+
+class CacheInfo(NamedTuple):
+    hits: int
+    misses: int
+
+
+@dataclass(frozen=True)
+class VideoMetadata:
+    """Details of a video scraped from its YouTube watch page"""
+    title: Optional[str]
+    channel_name: str = 'unknown'
+    duration: Optional[int] = None  # in seconds
+    language: Optional[str] = None
+
+
+def make_http_session() -> requests.Session:
+    """Create a session that keeps connections to YouTube alive between requests"""
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=4, pool_maxsize=16)
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    return session
+
+
+http_session = make_http_session()
+
+
+def read_video_metadata(response: requests.Response) -> Dict[str, str]:
+    """
+    Read a watch page until every metadata field has been found.
+
+    Title, channel and duration all appear in the <head> and the initial
+    player JSON, so most of the (often 1MB+) page is never downloaded.
+    """
+    decoder = codecs.getincrementaldecoder(response.encoding or 'utf-8')(errors='replace')
+    fields: Dict[str, str] = {}
+    page = ''
+
+    for chunk in response.iter_content(chunk_size=METADATA_CHUNK_SIZE):
+        # rescan a little of the previous text in case a match spans chunks
+        scan_from = max(0, len(page) - 4096)
+        page += decoder.decode(chunk)
+
+        for name, pattern in METADATA_PATTERNS.items():
+            if name not in fields:
+                match = pattern.search(page, scan_from)
+                if match:
+                    fields[name] = html.unescape(match.group(1))
+
+        if len(fields) == len(METADATA_PATTERNS) or len(page) >= METADATA_MAX_CHARS:
+            break
+        # videos without captions have no language, which is known once the
+        # player response is over
+        if fields.keys() >= METADATA_PATTERNS.keys() - {'language'} and \
+                PLAYER_RESPONSE_END in page[scan_from:]:
+            break
+
+    return fields
+
+
+def get_video_metadata(url: str, stream: bool = True) -> Optional[VideoMetadata]:
+    """Fetch the watch page once and extract title, channel, duration and language"""
     try:
-        response = requests.get(url)
-        title = re.search(r'<title>(.*?) - YouTube</title>', response.text)
-        return html.unescape(title.group(1)) if title else None
+        response = http_session.get(url, timeout=HTTP_TIMEOUT, stream=stream)
+        try:
+            fields = read_video_metadata(response)
+        finally:
+            response.close()
     except Exception as e:
-        print(f"Error getting video title {e}")
+        print(f"Error getting video metadata: {e}")
         return None
 
+    duration = fields.get('duration')
+    return VideoMetadata(
+        title=fields.get('title'),
+        channel_name=fields.get('channel_name') or 'unknown',
+        duration=int(duration) if duration else None,
+        language=fields.get('language'),
+    )
 
-def get_youtube_video_channel_name(url: str) -> Optional[str]:
-    """Get the YouTube channel name from a video URL."""
-    try:
-        response = requests.get(url)
 
-        channel_name = re.search(r'"channelName":"(.*?)"', response.text)
-        if channel_name:
-            decoded_name = html.unescape(channel_name.group(1))
-            return decoded_name if decoded_name else 'unknown'
+def get_youtube_title(url: str) -> Optional[str]:
+    """Get YouTube video title from an URL"""
+    metadata = get_video_metadata(url)
+    return metadata.title if metadata else None
 
-        return 'unknown'
 
-    except Exception as e:
-        print(f"Error getting channel name: {e}")
-        return None
+def get_youtube_video_channel_name(url: str) -> Optional[str]:
+    """Get the YouTube channel name from a video URL."""
+    metadata = get_video_metadata(url)
+    return metadata.channel_name if metadata else None
 
 
 def extract_video_id(youtube_url: str) -> Optional[str]:
@@ -45,29 +151,134 @@ def extract_video_id(youtube_url: str) -> Optional[str]:
     return match.group(1) if match else None
 
 
+def fetch_transcript_segments(video_id: str) -> TranscriptSegments:
+    """Get the timed transcript segments using YouTube Transcript API, raising on failure"""
+    return TranscriptSegments.from_items(YouTubeTranscriptApi.get_transcript(video_id))
+
+
+def fetch_transcript(video_id: str) -> str:
+    """Get video transcript using YouTube Transcript API, raising on failure"""
+    return fetch_transcript_segments(video_id).text
+
+
 def get_transcript(video_id: str) -> Optional[str]:
     """Get video transcript using YouTube Transcript API"""
     try:
-        transcript_list = YouTubeTranscriptApi.get_transcript(video_id)
-        transcript = ' '.join([item['text'] for item in transcript_list])
-        return transcript
+        return fetch_transcript(video_id)
     except Exception as e:
         return str(e)
 
 
-def get_summarizer(model_name: str = MODEL_NAME) -> Optional[Pipeline]:
-    """Initialize the summarization model"""
+def get_device(backend: str = 'torch') -> Union[int, str]:
+    """Pick the device the summarization model should run on"""
+    if backend != 'torch':
+        # quantized and ONNX Runtime models only run on the CPU
+        return "cpu"
+
+    import torch
+    return 0 if torch.cuda.is_available() else "cpu"
+
+
+def _load_torch(model_name: str, device: Union[int, str]) -> 'Pipeline':
+    from transformers import pipeline
+
+    return pipeline("summarization", model=model_name, device=device)
+
+
+def _load_torch_int8(model_name: str, device: Union[int, str]) -> 'Pipeline':
+    import torch
+    from transformers import AutoModelForSeq2SeqLM, AutoTokenizer, pipeline
+
+    model = AutoModelForSeq2SeqLM.from_pretrained(model_name)
+    # weights of the linear layers become int8, activations are quantized on the fly
+    model = torch.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+    return pipeline("summarization", model=model,
+                    tokenizer=AutoTokenizer.from_pretrained(model_name), device=device)
+
+
+def _load_onnx(model_name: str, device: Union[int, str]) -> 'Pipeline':
+    from transformers import AutoTokenizer, pipeline
+    # optional dependency: pip install optimum[onnxruntime]
+    from optimum.onnxruntime import ORTModelForSeq2SeqLM
+
+    model = ORTModelForSeq2SeqLM.from_pretrained(model_name, export=True)
+    return pipeline("summarization", model=model,
+                    tokenizer=AutoTokenizer.from_pretrained(model_name), device=device)
+
+
+# inference backends by name, each loads a summarization pipeline for (model, device)
+BACKENDS: Dict[str, Callable[[str, Union[int, str]], 'Pipeline']] = {
+    'torch': _load_torch,
+    'torch-int8': _load_torch_int8,
+    'onnx': _load_onnx,
+}
+
+
+def get_summarizer(model_name: str = MODEL_NAME, backend: str = 'torch') -> Optional['Pipeline']:
+    """Return the summarization model, loading it only once per process and backend"""
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown summarization backend {backend!r},"
+                         f" expected one of {', '.join(BACKENDS)}")
+
     try:
-        summarizer = pipeline(
-            "summarization",
-            model=model_name,
-            device=0 if torch.cuda.is_available() else "cpu"
-        )
+        device = get_device(backend)
+    except ImportError as e:
+        # torch is missing or broken, like any other model that can't be loaded
+        print(f"Error loading model: {e}")
+        return None
+    key = (model_name, str(device), backend)
+
+    summarizer = _summarizers.get(key)
+    if summarizer is not None:
+        return summarizer
+
+    with _summarizers_lock:
+        # another thread may have finished loading while we were waiting
+        summarizer = _summarizers.get(key)
+        if summarizer is not None:
+            return summarizer
+
+        try:
+            summarizer = BACKENDS[backend](model_name, device)
+        except Exception as e:
+            print(f"Error loading model: {e}")
+            return None
+
+        _summarizers[key] = summarizer
         return summarizer
+
+
+def warm_up(summarizer: 'Pipeline') -> None:
+    """Run one short inference so the first job doesn't pay for lazy initialization"""
+    try:
+        summarizer([WARMUP_TEXT], max_length=20, min_length=5, do_sample=False, truncation=True)
     except Exception as e:
-        print(f"Error loading model: {e}")
+        print(f"Error warming up model: {e}")
+
+
+def clear_summarizers() -> None:
+    """Drop all loaded models from the process-wide registry"""
+    with _summarizers_lock:
+        _summarizers.clear()
+        _tokenizers.clear()
+
+
+def get_tokenizer(model_name: str = MODEL_NAME) -> Optional[Any]:
+    """Return the tokenizer of a model without loading the model, once per process"""
+    tokenizer = _tokenizers.get(model_name)
+    if tokenizer is not None:
+        return tokenizer
+
+    try:
+        from transformers import AutoTokenizer
+        tokenizer = AutoTokenizer.from_pretrained(model_name)
+    except Exception as e:
+        print(f"Error loading tokenizer: {e}")
         return None
 
+    _tokenizers[model_name] = tokenizer
+    return tokenizer
+
 
 def text_chunking(text: str, max_chunk_length: int = 1024, overlap: int = 200) -> List[str]:
     """Create overlapping chunks to preserve context between segments."""
@@ -78,22 +289,470 @@ def text_chunking(text: str, max_chunk_length: int = 1024, overlap: int = 200) -
     return chunks
 
 
-def summarize_text(text: str, max_length: int = 50, model_name: str = MODEL_NAME) -> str:
-    """Summarize text using the specified model"""
-    summarizer = get_summarizer(model_name)
+def split_sentences(text: str) -> List[str]:
+    """Split text into sentences on terminal punctuation"""
+    return [sentence for sentence in SENTENCE_END.split(text) if sentence.strip()]
+
+
+def get_max_input_tokens(tokenizer: Any) -> int:
+    """Number of input tokens the model accepts, excluding special tokens"""
+    max_length = getattr(tokenizer, 'model_max_length', None)
+    # tokenizers without a configured limit report a huge sentinel value
+    if not isinstance(max_length, int) or max_length > 100_000:
+        max_length = DEFAULT_MAX_INPUT_TOKENS
+    return max_length - tokenizer.num_special_tokens_to_add()
+
+
+def pack_units(lengths: List[int], max_tokens: int, overlap_tokens: int = 0) -> List[Tuple[int, int]]:
+    """
+    Greedily pack consecutive units into windows of at most max_tokens.
+
+    Returns (start, end) unit index ranges. Each window after the first
+    starts with trailing units of the previous one, up to overlap_tokens.
+    """
+    spans: List[Tuple[int, int]] = []
+    start = 0
+
+    while start < len(lengths):
+        end = start
+        total = 0
+        while end < len(lengths) and (end == start or total + lengths[end] <= max_tokens):
+            total += lengths[end]
+            end += 1
+
+        spans.append((start, end))
+        if end >= len(lengths):
+            break
+
+        # the overlap must leave room for the first new unit of the next window
+        budget = min(overlap_tokens, max_tokens - lengths[end])
+        next_start = end
+        carried = 0
+        while next_start - 1 > start and carried + lengths[next_start - 1] <= budget:
+            next_start -= 1
+            carried += lengths[next_start]
+
+        start = next_start
+
+    return spans
+
+
+def split_words(text: str, tokenizer: Any, max_tokens: int) -> Tuple[List[str], List[int]]:
+    """
+    Split text that overflows a window into words, with their token counts.
+
+    Only a single word longer than the whole window is cut on token boundaries.
+    """
+    words: List[str] = []
+    lengths: List[int] = []
+    split = text.split()
+    if not split:
+        return words, lengths
+
+    encoded = tokenizer([' ' + word for word in split], add_special_tokens=False)['input_ids']
+    for word, ids in zip(split, encoded):
+        if len(ids) <= max_tokens:
+            words.append(word)
+            lengths.append(len(ids))
+            continue
+
+        for i in range(0, len(ids), max_tokens):
+            piece = ids[i:i + max_tokens]
+            words.append(tokenizer.decode(piece, skip_special_tokens=True).strip())
+            lengths.append(len(piece))
+
+    return words, lengths
+
+
+def token_chunking(text: str, tokenizer: Any, max_tokens: Optional[int] = None,
+                   overlap_tokens: int = 50) -> List[str]:
+    """
+    Split text into chunks that fill the model's input window.
+
+    Chunk boundaries fall on sentence edges; sentences longer than a whole
+    window, such as unpunctuated captions, are split between words instead.
+    """
+    if max_tokens is None:
+        max_tokens = get_max_input_tokens(tokenizer)
+
+    units: List[str] = []
+    lengths: List[int] = []
+    sentences = split_sentences(text)
+    if not sentences:
+        return []
+
+    # a leading space makes BPE tokenizers count sentences as they appear joined
+    encoded = tokenizer([' ' + sentence for sentence in sentences],
+                        add_special_tokens=False)['input_ids']
+    for sentence, ids in zip(sentences, encoded):
+        if len(ids) <= max_tokens:
+            units.append(sentence)
+            lengths.append(len(ids))
+            continue
+
+        # e.g. auto-generated captions, which have no punctuation at all
+        words, word_lengths = split_words(sentence, tokenizer, max_tokens)
+        units.extend(words)
+        lengths.extend(word_lengths)
+
+    return [' '.join(units[start:end])
+            for start, end in pack_units(lengths, max_tokens, overlap_tokens)]
+
+
+def chunk_segments(segments: TranscriptSegments, tokenizer: Any = None,
+                   max_tokens: Optional[int] = None,
+                   overlap_tokens: int = 50) -> List[TranscriptChunk]:
+    """
+    Pack consecutive transcript segments into chunks that fill the model's input window.
+
+    Chunk boundaries fall on segment edges, so every chunk maps back to the time
+    range it covers. Segments longer than a whole window are split between
+    words; without a tokenizer they are counted in words and never cut.
+    """
+    if not len(segments):
+        return []
+
+    texts = [segments.segment_text(i) for i in range(len(segments))]
+    if tokenizer is not None:
+        if max_tokens is None:
+            max_tokens = get_max_input_tokens(tokenizer)
+        # a leading space makes BPE tokenizers count segments as they appear joined
+        encoded = tokenizer([' ' + text for text in texts],
+                            add_special_tokens=False)['input_ids']
+    else:
+        if max_tokens is None:
+            # words are longer than tokens, leave room for the difference
+            max_tokens = DEFAULT_MAX_INPUT_TOKENS // 2
+        encoded = [text.split() for text in texts]
+
+    # units are whole segments, or pieces of a segment when it overflows a window
+    lengths: List[int] = []
+    sources: List[int] = []
+    pieces: Dict[int, str] = {}
+    for i, ids in enumerate(encoded):
+        if len(ids) <= max_tokens or tokenizer is None:
+            lengths.append(len(ids))
+            sources.append(i)
+            continue
+
+        for word, length in zip(*split_words(texts[i], tokenizer, max_tokens)):
+            pieces[len(sources)] = word
+            lengths.append(length)
+            sources.append(i)
+
+    chunks: List[TranscriptChunk] = []
+    for start, end in pack_units(lengths, max_tokens, overlap_tokens):
+        first, last = sources[start], sources[end - 1]
+        if any(unit in pieces for unit in range(start, end)):
+            text = ' '.join(pieces.get(unit, texts[sources[unit]]) for unit in range(start, end))
+        else:
+            text = segments.span_text(first, last)
+        chunks.append(TranscriptChunk(text, *segments.time_range(first, last)))
+
+    return chunks
+
+
+def count_tokens(summarizer: 'Pipeline', texts: List[str]) -> List[int]:
+    """Count tokens of each text, falling back to words without a tokenizer"""
+    return count_tokenizer_tokens(getattr(summarizer, 'tokenizer', None), texts)
+
+
+def count_tokenizer_tokens(tokenizer: Any, texts: List[str]) -> List[int]:
+    """Count tokens of each text with a tokenizer, or words without one"""
+    if tokenizer is not None:
+        try:
+            lengths = [len(ids) for ids in tokenizer(texts)['input_ids']]
+            if len(lengths) == len(texts):
+                return lengths
+        except Exception as e:
+            print(f"Error counting tokens: {e}")
+
+    return [len(text.split()) for text in texts]
+
+
+def make_batches(lengths: List[int], batch_size: int,
+                 max_batch_tokens: Optional[int] = None) -> List[List[int]]:
+    """
+    Group item indices into batches for padded inference.
+
+    Items are sorted by length so that each batch pads to a similar size.
+    A batch holds at most batch_size items and, when max_batch_tokens is set,
+    its padded size (items * longest item) stays within that budget.
+    """
+    batches: List[List[int]] = []
+    current: List[int] = []
+    longest = 0
+
+    for i in sorted(range(len(lengths)), key=lambda i: lengths[i]):
+        new_longest = max(longest, lengths[i])
+        over_budget = (max_batch_tokens is not None and
+                       new_longest * (len(current) + 1) > max_batch_tokens)
+
+        if current and (len(current) >= batch_size or over_budget):
+            batches.append(current)
+            current = []
+            new_longest = lengths[i]
+
+        current.append(i)
+        longest = new_longest
+
+    if current:
+        batches.append(current)
+
+    return batches
+
+
+def summary_cache_key(text: str, model_name: str, params: Dict[str, Any]) -> str:
+    """Content address of a summary: transcript hash, model and generation parameters"""
+    key = {
+        'version': SUMMARY_CACHE_VERSION,
+        'transcript': hashlib.sha256(text.encode('utf8')).hexdigest(),
+        'model': model_name,
+        'params': params,
+    }
+    return hashlib.sha256(json.dumps(key, sort_keys=True).encode('utf8')).hexdigest()
+
+
+def summary_cache_info() -> CacheInfo:
+    """Hits and misses of the summary cache in this process"""
+    with _summary_cache_lock:
+        return CacheInfo(**_summary_cache_stats)
+
+
+def _count_summary_cache(result: str) -> None:
+    with _summary_cache_lock:
+        _summary_cache_stats[result] += 1
+
+
+def summarize_text(text: str, max_length: int = 50, model_name: str = MODEL_NAME,
+                   summarizer: Optional['Pipeline'] = None, batch_size: int = 8,
+                   max_batch_tokens: Optional[int] = None, overlap_tokens: int = 50,
+                   cache: Optional['DiskCache'] = None, target_tokens: Optional[int] = None,
+                   max_calls: Optional[int] = None, workers: int = 1,
+                   backend: str = 'torch') -> str:
+    """
+    Summarize text using the given pipeline or the shared one for model_name.
+
+    Chunk summaries are joined as they are, unless target_tokens is set: then
+    they are condensed with reduce_summaries until they fit. max_calls caps the
+    number of chunks sent to the model over all stages, and workers is the
+    number of batches summarized in parallel. backend only picks the shared
+    pipeline when none is given, but always keys the cache.
+    """
+    key = None
+    if cache is not None:
+        key = summary_cache_key(text, model_name, {
+            'max_length': max_length,
+            'min_length': 15,
+            'overlap_tokens': overlap_tokens,
+            'target_tokens': target_tokens,
+            'max_calls': max_calls,
+            'backend': backend,
+        })
+        cached = cache.get('summary', key)
+        if cached is not None:
+            _count_summary_cache('hits')
+            return cached
+        _count_summary_cache('misses')
+
+    if summarizer is None:
+        summarizer = get_summarizer(model_name, backend)
+    summary, complete = _summarize_chunks(text, max_length, summarizer,
+                                          batch_size, max_batch_tokens, overlap_tokens,
+                                          target_tokens, max_calls, workers)
+
+    # summaries with failed chunks are returned but never cached
+    if key is not None and complete and summary:
+        cache.set('summary', key, summary)
+
+    return summary
+
+
+def _summarize_chunks(text: str, max_length: int, summarizer: Optional['Pipeline'],
+                      batch_size: int, max_batch_tokens: Optional[int], overlap_tokens: int,
+                      target_tokens: Optional[int] = None, max_calls: Optional[int] = None,
+                      workers: int = 1) -> Tuple[str, bool]:
+    """Summarize every chunk of text, also telling whether all chunks succeeded"""
+    # the caller already tried to load the model of the requested backend
     if not summarizer:
-        return "Error: Could not load summarization model"
+        return "Error: Could not load summarization model", False
+
+    tokenizer = getattr(summarizer, 'tokenizer', None)
+    if tokenizer is not None:
+        chunks = token_chunking(text, tokenizer, overlap_tokens=overlap_tokens)
+    else:
+        chunks = text_chunking(text=text)
+    if max_calls is not None and len(chunks) > max_calls:
+        return (f"Error: Text is too long to summarize ({len(chunks)} chunks,"
+                f" at most {max_calls} model calls)"), False
+
+    summaries, complete = _summarize_batches(chunks, summarizer, max_length,
+                                             batch_size, max_batch_tokens, workers)
+    summaries = [summary for summary in summaries if summary]
+    if target_tokens is None:
+        return ' '.join(summaries), complete
+
+    remaining = None if max_calls is None else max_calls - len(chunks)
+    summary, reduced = reduce_summaries(summaries, summarizer, target_tokens, remaining,
+                                        batch_size, max_batch_tokens, workers)
+    return summary, complete and reduced
 
-    chunks = text_chunking(text=text)
 
-    summaries: List[str] = []
-    for chunk in chunks:
+def _summarize_batches(chunks: List[str], summarizer: 'Pipeline', max_length: int,
+                       batch_size: int, max_batch_tokens: Optional[int],
+                       workers: int = 1) -> Tuple[List[Optional[str]], bool]:
+    """Summarize chunks in length-sorted batches; failed chunks are left as None"""
+    lengths = count_tokens(summarizer, chunks)
+    batches = make_batches(lengths, batch_size, max_batch_tokens)
+
+    def run(batch: List[int]) -> Optional[List[Dict[str, str]]]:
+        inputs = [chunks[i] for i in batch]
         try:
-            summary = summarizer(chunk, max_length=max_length, min_length=15, do_sample=False)[
-                0]['summary_text']
-            summaries.append(summary)
+            return summarizer(inputs, batch_size=len(inputs), max_length=max_length,
+                              min_length=15, do_sample=False, truncation=True)
         except Exception as e:
-            print(f"Error summarizing chunk: {e}")
+            print(f"Error summarizing batch: {e}")
+            return None
+
+    if workers > 1 and len(batches) > 1:
+        # torch releases the GIL inside its kernels, so batches overlap in threads
+        with ThreadPoolExecutor(max_workers=min(workers, len(batches)),
+                                thread_name_prefix='summ-map') as executor:
+            results = list(executor.map(run, batches))
+    else:
+        results = [run(batch) for batch in batches]
+
+    # batches are built out of order, so results are written back by index
+    summaries: List[Optional[str]] = [None] * len(chunks)
+    complete = True
+    for batch, outputs in zip(batches, results):
+        if outputs is None:
+            complete = False
+            continue
+
+        for i, output in zip(batch, outputs):
+            summaries[i] = output['summary_text']
+
+    return summaries, complete
+
+
+def reduce_summaries(summaries: List[str], summarizer: Optional['Pipeline'], target_tokens: int,
+                     max_calls: Optional[int] = None, batch_size: int = 8,
+                     max_batch_tokens: Optional[int] = None, workers: int = 1,
+                     tokenizer: Any = None,
+                     load_summarizer: Optional[Callable[[], Optional['Pipeline']]] = None
+                     ) -> Tuple[str, bool]:
+    """
+    Condense chunk summaries until they fit in target_tokens.
+
+    Each round packs consecutive summaries into model-sized windows and
+    summarizes every window again. Rounds stop once the text fits, stops
+    shrinking, or the next round would take more than max_calls model calls;
+    whatever is still over target_tokens is then cut off. Also tells whether
+    every window was summarized successfully.
+
+    Without a summarizer, tokens are counted with the given tokenizer and
+    load_summarizer is only called once a round has to run.
+    """
+    if summarizer is not None:
+        tokenizer = getattr(summarizer, 'tokenizer', None)
+
+    complete = True
+    while summaries:
+        lengths = count_tokenizer_tokens(tokenizer, summaries)
+        if sum(lengths) <= target_tokens:
+            break
+        if summarizer is None and load_summarizer is not None:
+            summarizer = load_summarizer()
+            load_summarizer = None
+            tokenizer = getattr(summarizer, 'tokenizer', None) or tokenizer
             continue
+        if summarizer is None:
+            break
+
+        if tokenizer is not None:
+            window = get_max_input_tokens(tokenizer)
+        else:
+            # words are longer than tokens, leave room for the difference
+            window = DEFAULT_MAX_INPUT_TOKENS // 2
+        # a round has to at least halve the text to be worth another
+        max_length = max(min(target_tokens, window // 2), 16)
+
+        spans = pack_units(lengths, window)
+        if len(spans) >= len(summaries):
+            break
+        if max_calls is not None and len(spans) > max_calls:
+            break
+        if max_calls is not None:
+            max_calls -= len(spans)
+
+        groups = [' '.join(summaries[start:end]) for start, end in spans]
+        reduced, round_complete = _summarize_batches(groups, summarizer, max_length,
+                                                     batch_size, max_batch_tokens, workers)
+        complete = complete and round_complete
+        # a failed window keeps its input rather than losing that part of the video
+        summaries = [summary or group for summary, group in zip(reduced, groups)]
+
+    return truncate_tokens(' '.join(summaries), tokenizer, target_tokens), complete
+
+
+def truncate_tokens(text: str, tokenizer: Any, max_tokens: int) -> str:
+    """Cut text to at most max_tokens tokens, or words without a tokenizer"""
+    if tokenizer is None:
+        words = text.split()
+        return text if len(words) <= max_tokens else ' '.join(words[:max_tokens])
+
+    ids = tokenizer([text], add_special_tokens=False)['input_ids'][0]
+    if len(ids) <= max_tokens:
+        return text
+    return tokenizer.decode(ids[:max_tokens], skip_special_tokens=True).strip()
+
+
+def summarize_segments(segments: TranscriptSegments, max_length: int = 50,
+                       model_name: str = MODEL_NAME, summarizer: Optional['Pipeline'] = None,
+                       batch_size: int = 8, max_batch_tokens: Optional[int] = None,
+                       overlap_tokens: int = 50, cache: Optional['DiskCache'] = None,
+                       max_calls: Optional[int] = None, workers: int = 1,
+                       backend: str = 'torch') -> Optional[List[SectionSummary]]:
+    """
+    Summarize each chunk of a timed transcript separately.
+
+    Returns one section per chunk with the time range it covers, or None if
+    the model could not be loaded. Sections whose batch failed are left out.
+    Raises ValueError when there are more chunks than max_calls.
+    """
+    key = None
+    if cache is not None:
+        key = summary_cache_key(segments.text, model_name, {
+            'max_length': max_length,
+            'min_length': 15,
+            'overlap_tokens': overlap_tokens,
+            'sections': hashlib.sha256(segments.timings_to_bytes()).hexdigest(),
+            'backend': backend,
+        })
+        cached = cache.get('summary', key)
+        if cached is not None:
+            _count_summary_cache('hits')
+            return [SectionSummary(**section) for section in cached]
+        _count_summary_cache('misses')
+
+    if summarizer is None:
+        summarizer = get_summarizer(model_name, backend)
+    if not summarizer:
+        return None
+
+    chunks = chunk_segments(segments, getattr(summarizer, 'tokenizer', None),
+                            overlap_tokens=overlap_tokens)
+    if max_calls is not None and len(chunks) > max_calls:
+        raise ValueError(f'The transcript is too long to summarize ({len(chunks)} sections,'
+                         f' at most {max_calls} model calls).')
+    summaries, complete = _summarize_batches([chunk.text for chunk in chunks], summarizer,
+                                             max_length, batch_size, max_batch_tokens, workers)
+    sections = [SectionSummary(chunk.start, chunk.end, summary)
+                for chunk, summary in zip(chunks, summaries) if summary]
+
+    # sections with failed chunks are returned but never cached
+    if key is not None and complete and sections:
+        cache.set('summary', key, [asdict(section) for section in sections])
 
-    return ' '.join(summaries)
+    return sections
@@ -0,0 +1,18 @@
+-- Background summarization jobs
+CREATE TABLE IF NOT EXISTS job (
+  id INTEGER PRIMARY KEY AUTOINCREMENT,
+  author_id INTEGER NOT NULL,
+  category_id INTEGER NOT NULL,
+  yt_url TEXT NOT NULL,
+  video_id TEXT NOT NULL,
+  status TEXT NOT NULL DEFAULT 'queued',
+  error TEXT,
+  summary_id INTEGER,
+  created_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+  updated_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+  FOREIGN KEY (author_id) REFERENCES user (id),
+  FOREIGN KEY (category_id) REFERENCES category (id),
+  FOREIGN KEY (summary_id) REFERENCES summary (id)
+);
+
+CREATE INDEX IF NOT EXISTS idx_job_video_id ON job (video_id, status);
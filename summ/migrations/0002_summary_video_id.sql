@@ -0,0 +1,8 @@
+-- Normalized video ID used to detect duplicate submissions
+ALTER TABLE summary ADD COLUMN video_id TEXT;
+
+-- if older rows point at the same video, only the first one gets the ID
+UPDATE summary SET video_id = extract_video_id(yt_url)
+WHERE id IN (SELECT MIN(id) FROM summary GROUP BY extract_video_id(yt_url));
+
+CREATE UNIQUE INDEX idx_summary_video_id ON summary (video_id);
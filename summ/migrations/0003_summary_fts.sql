@@ -0,0 +1,30 @@
+-- Full-text index over the searchable summary columns, kept in sync by triggers
+CREATE VIRTUAL TABLE summary_fts USING fts5(
+  yt_title,
+  yt_channel_name,
+  summary_text,
+  transcript,
+  content='summary',
+  content_rowid='id',
+  tokenize='porter unicode61'
+);
+
+CREATE TRIGGER summary_fts_insert AFTER INSERT ON summary BEGIN
+  INSERT INTO summary_fts (rowid, yt_title, yt_channel_name, summary_text, transcript)
+  VALUES (new.id, new.yt_title, new.yt_channel_name, new.summary_text, new.transcript);
+END;
+
+CREATE TRIGGER summary_fts_delete AFTER DELETE ON summary BEGIN
+  INSERT INTO summary_fts (summary_fts, rowid, yt_title, yt_channel_name, summary_text, transcript)
+  VALUES ('delete', old.id, old.yt_title, old.yt_channel_name, old.summary_text, old.transcript);
+END;
+
+CREATE TRIGGER summary_fts_update
+AFTER UPDATE OF yt_title, yt_channel_name, summary_text, transcript ON summary BEGIN
+  INSERT INTO summary_fts (summary_fts, rowid, yt_title, yt_channel_name, summary_text, transcript)
+  VALUES ('delete', old.id, old.yt_title, old.yt_channel_name, old.summary_text, old.transcript);
+  INSERT INTO summary_fts (rowid, yt_title, yt_channel_name, summary_text, transcript)
+  VALUES (new.id, new.yt_title, new.yt_channel_name, new.summary_text, new.transcript);
+END;
+
+INSERT INTO summary_fts (summary_fts) VALUES ('rebuild');
@@ -0,0 +1,6 @@
+-- Indexes for the listing, filtering, favorites and job queue queries
+CREATE INDEX idx_summary_created_at ON summary (created_at, id);
+CREATE INDEX idx_summary_category_id ON summary (category_id, created_at, id);
+CREATE INDEX idx_summary_author_id ON summary (author_id);
+CREATE INDEX idx_user_favorite_summary_summary_id ON user_favorite_summary (summary_id);
+CREATE INDEX idx_job_status ON job (status, id);
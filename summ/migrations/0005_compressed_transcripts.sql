@@ -0,0 +1,59 @@
+-- Move transcripts out of the summary table into zlib-compressed blobs.
+-- compress() and decompress() are registered on every connection by db.connect.
+-- NOTE: summaries now need them to change, see "Database" in README.md
+CREATE TABLE summary_transcript (
+  summary_id INTEGER PRIMARY KEY,
+  body BLOB NOT NULL,
+  FOREIGN KEY (summary_id) REFERENCES summary (id)
+);
+
+INSERT INTO summary_transcript (summary_id, body)
+SELECT id, compress(transcript) FROM summary;
+
+-- the search index reads transcripts, so it is rebuilt on top of the new table
+DROP TRIGGER summary_fts_insert;
+DROP TRIGGER summary_fts_delete;
+DROP TRIGGER summary_fts_update;
+DROP TABLE summary_fts;
+
+ALTER TABLE summary DROP COLUMN transcript;
+
+CREATE VIEW summary_document AS
+SELECT s.id, s.yt_title, s.yt_channel_name, s.summary_text, decompress(t.body) AS transcript
+FROM summary s
+INNER JOIN summary_transcript t ON t.summary_id = s.id;
+
+CREATE VIRTUAL TABLE summary_fts USING fts5(
+  yt_title,
+  yt_channel_name,
+  summary_text,
+  transcript,
+  content='summary_document',
+  content_rowid='id',
+  tokenize='porter unicode61'
+);
+
+CREATE TRIGGER summary_fts_insert AFTER INSERT ON summary_transcript BEGIN
+  INSERT INTO summary_fts (rowid, yt_title, yt_channel_name, summary_text, transcript)
+  SELECT id, yt_title, yt_channel_name, summary_text, decompress(new.body)
+  FROM summary WHERE id = new.summary_id;
+END;
+
+CREATE TRIGGER summary_fts_delete AFTER DELETE ON summary BEGIN
+  INSERT INTO summary_fts (summary_fts, rowid, yt_title, yt_channel_name, summary_text, transcript)
+  SELECT 'delete', old.id, old.yt_title, old.yt_channel_name, old.summary_text, decompress(body)
+  FROM summary_transcript WHERE summary_id = old.id;
+  DELETE FROM summary_transcript WHERE summary_id = old.id;
+END;
+
+CREATE TRIGGER summary_fts_update
+AFTER UPDATE OF yt_title, yt_channel_name, summary_text ON summary BEGIN
+  INSERT INTO summary_fts (summary_fts, rowid, yt_title, yt_channel_name, summary_text, transcript)
+  SELECT 'delete', old.id, old.yt_title, old.yt_channel_name, old.summary_text, decompress(body)
+  FROM summary_transcript WHERE summary_id = old.id;
+  INSERT INTO summary_fts (rowid, yt_title, yt_channel_name, summary_text, transcript)
+  SELECT new.id, new.yt_title, new.yt_channel_name, new.summary_text, decompress(body)
+  FROM summary_transcript WHERE summary_id = new.id;
+END;
+
+INSERT INTO summary_fts (summary_fts) VALUES ('rebuild');
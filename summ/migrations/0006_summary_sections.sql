@@ -0,0 +1,22 @@
+-- Keep transcript segment timings and store a summary per transcript section.
+ALTER TABLE summary_transcript ADD COLUMN timings BLOB;
+
+CREATE TABLE summary_section (
+  summary_id INTEGER NOT NULL,
+  position INTEGER NOT NULL,
+  start_time REAL NOT NULL,
+  end_time REAL NOT NULL,
+  summary_text TEXT NOT NULL,
+  PRIMARY KEY (summary_id, position),
+  FOREIGN KEY (summary_id) REFERENCES summary (id)
+);
+
+DROP TRIGGER summary_fts_delete;
+
+CREATE TRIGGER summary_fts_delete AFTER DELETE ON summary BEGIN
+  INSERT INTO summary_fts (summary_fts, rowid, yt_title, yt_channel_name, summary_text, transcript)
+  SELECT 'delete', old.id, old.yt_title, old.yt_channel_name, old.summary_text, decompress(body)
+  FROM summary_transcript WHERE summary_id = old.id;
+  DELETE FROM summary_transcript WHERE summary_id = old.id;
+  DELETE FROM summary_section WHERE summary_id = old.id;
+END;
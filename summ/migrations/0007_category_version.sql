@@ -0,0 +1,19 @@
+-- Version counter that lets every process know when its cached categories are stale.
+CREATE TABLE cache_version (
+  name TEXT PRIMARY KEY,
+  version INTEGER NOT NULL
+);
+
+INSERT INTO cache_version (name, version) VALUES ('category', CAST(strftime('%s', 'now') AS INTEGER));
+
+CREATE TRIGGER category_version_insert AFTER INSERT ON category BEGIN
+  UPDATE cache_version SET version = version + 1 WHERE name = 'category';
+END;
+
+CREATE TRIGGER category_version_update AFTER UPDATE ON category BEGIN
+  UPDATE cache_version SET version = version + 1 WHERE name = 'category';
+END;
+
+CREATE TRIGGER category_version_delete AFTER DELETE ON category BEGIN
+  UPDATE cache_version SET version = version + 1 WHERE name = 'category';
+END;
@@ -0,0 +1,27 @@
+-- Versions for conditional GETs: per summary for the detail page, and
+-- listing-wide counters for the index and favorites pages.
+ALTER TABLE summary ADD COLUMN version INTEGER NOT NULL DEFAULT 1;
+
+INSERT INTO cache_version (name, version)
+SELECT name, CAST(strftime('%s', 'now') AS INTEGER)
+FROM (SELECT 'summary' AS name UNION ALL SELECT 'favorite');
+
+CREATE TRIGGER summary_version_insert AFTER INSERT ON summary BEGIN
+  UPDATE cache_version SET version = version + 1 WHERE name = 'summary';
+END;
+
+CREATE TRIGGER summary_version_update AFTER UPDATE ON summary BEGIN
+  UPDATE cache_version SET version = version + 1 WHERE name = 'summary';
+END;
+
+CREATE TRIGGER summary_version_delete AFTER DELETE ON summary BEGIN
+  UPDATE cache_version SET version = version + 1 WHERE name = 'summary';
+END;
+
+CREATE TRIGGER favorite_version_insert AFTER INSERT ON user_favorite_summary BEGIN
+  UPDATE cache_version SET version = version + 1 WHERE name = 'favorite';
+END;
+
+CREATE TRIGGER favorite_version_delete AFTER DELETE ON user_favorite_summary BEGIN
+  UPDATE cache_version SET version = version + 1 WHERE name = 'favorite';
+END;
@@ -1,7 +1,13 @@
+DROP VIEW IF EXISTS summary_document;
+DROP TABLE IF EXISTS summary_fts;
+DROP TABLE IF EXISTS summary_transcript;
+DROP TABLE IF EXISTS summary_section;
 DROP TABLE IF EXISTS user;
 DROP TABLE IF EXISTS summary;
 DROP TABLE IF EXISTS category;
 DROP TABLE IF EXISTS user_favorite_summary;
+DROP TABLE IF EXISTS job;
+DROP TABLE IF EXISTS cache_version;
 
 CREATE TABLE user (
   id INTEGER PRIMARY KEY AUTOINCREMENT,
@@ -15,6 +21,29 @@ CREATE TABLE category (
   created_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
 );
 
+-- Bumped on every change of a table whose rows processes keep in memory.
+-- Starts at the creation time, so a re-created database never matches an old copy.
+CREATE TABLE cache_version (
+  name TEXT PRIMARY KEY,
+  version INTEGER NOT NULL
+);
+
+INSERT INTO cache_version (name, version)
+SELECT name, CAST(strftime('%s', 'now') AS INTEGER)
+FROM (SELECT 'category' AS name UNION ALL SELECT 'summary' UNION ALL SELECT 'favorite');
+
+CREATE TRIGGER category_version_insert AFTER INSERT ON category BEGIN
+  UPDATE cache_version SET version = version + 1 WHERE name = 'category';
+END;
+
+CREATE TRIGGER category_version_update AFTER UPDATE ON category BEGIN
+  UPDATE cache_version SET version = version + 1 WHERE name = 'category';
+END;
+
+CREATE TRIGGER category_version_delete AFTER DELETE ON category BEGIN
+  UPDATE cache_version SET version = version + 1 WHERE name = 'category';
+END;
+
 CREATE TABLE summary (
   id INTEGER PRIMARY KEY AUTOINCREMENT,
   author_id INTEGER NOT NULL,
@@ -22,13 +51,97 @@ CREATE TABLE summary (
   created_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
   yt_url TEXT UNIQUE NOT NULL,
   yt_title TEXT UNIQUE NOT NULL,
+  video_id TEXT,
   yt_channel_name TEXT,
-  transcript TEXT NOT NULL,
   summary_text TEXT NOT NULL,
+  -- bumped by every edit, part of the detail page ETag
+  version INTEGER NOT NULL DEFAULT 1,
   FOREIGN KEY (author_id) REFERENCES user (id),
   FOREIGN KEY (category_id) REFERENCES category (id)
 );
 
+CREATE UNIQUE INDEX idx_summary_video_id ON summary (video_id);
+CREATE INDEX idx_summary_created_at ON summary (created_at, id);
+CREATE INDEX idx_summary_category_id ON summary (category_id, created_at, id);
+CREATE INDEX idx_summary_author_id ON summary (author_id);
+
+-- the listing version, part of the index and favorites page ETags
+CREATE TRIGGER summary_version_insert AFTER INSERT ON summary BEGIN
+  UPDATE cache_version SET version = version + 1 WHERE name = 'summary';
+END;
+
+CREATE TRIGGER summary_version_update AFTER UPDATE ON summary BEGIN
+  UPDATE cache_version SET version = version + 1 WHERE name = 'summary';
+END;
+
+CREATE TRIGGER summary_version_delete AFTER DELETE ON summary BEGIN
+  UPDATE cache_version SET version = version + 1 WHERE name = 'summary';
+END;
+
+-- Transcripts are large and only shown on the detail page, so they are
+-- kept zlib-compressed (see db.compress_text) outside the summary table
+CREATE TABLE summary_transcript (
+  summary_id INTEGER PRIMARY KEY,
+  body BLOB NOT NULL,
+  -- compressed segment offsets and timings, see TranscriptSegments.timings_to_bytes
+  timings BLOB,
+  FOREIGN KEY (summary_id) REFERENCES summary (id)
+);
+
+-- Summary of each chunk of the transcript, with the time range it covers
+CREATE TABLE summary_section (
+  summary_id INTEGER NOT NULL,
+  position INTEGER NOT NULL,
+  start_time REAL NOT NULL,
+  end_time REAL NOT NULL,
+  summary_text TEXT NOT NULL,
+  PRIMARY KEY (summary_id, position),
+  FOREIGN KEY (summary_id) REFERENCES summary (id)
+);
+
+-- Searchable text of a summary, with the transcript decompressed
+-- NOTE: needs db.connect's decompress(), see "Database" in README.md
+CREATE VIEW summary_document AS
+SELECT s.id, s.yt_title, s.yt_channel_name, s.summary_text, decompress(t.body) AS transcript
+FROM summary s
+INNER JOIN summary_transcript t ON t.summary_id = s.id;
+
+-- Full-text index over the searchable summary columns, kept in sync by triggers
+CREATE VIRTUAL TABLE summary_fts USING fts5(
+  yt_title,
+  yt_channel_name,
+  summary_text,
+  transcript,
+  content='summary_document',
+  content_rowid='id',
+  tokenize='porter unicode61'
+);
+
+-- a summary is indexed once its transcript has been stored
+CREATE TRIGGER summary_fts_insert AFTER INSERT ON summary_transcript BEGIN
+  INSERT INTO summary_fts (rowid, yt_title, yt_channel_name, summary_text, transcript)
+  SELECT id, yt_title, yt_channel_name, summary_text, decompress(new.body)
+  FROM summary WHERE id = new.summary_id;
+END;
+
+CREATE TRIGGER summary_fts_delete AFTER DELETE ON summary BEGIN
+  INSERT INTO summary_fts (summary_fts, rowid, yt_title, yt_channel_name, summary_text, transcript)
+  SELECT 'delete', old.id, old.yt_title, old.yt_channel_name, old.summary_text, decompress(body)
+  FROM summary_transcript WHERE summary_id = old.id;
+  DELETE FROM summary_transcript WHERE summary_id = old.id;
+  DELETE FROM summary_section WHERE summary_id = old.id;
+END;
+
+CREATE TRIGGER summary_fts_update
+AFTER UPDATE OF yt_title, yt_channel_name, summary_text ON summary BEGIN
+  INSERT INTO summary_fts (summary_fts, rowid, yt_title, yt_channel_name, summary_text, transcript)
+  SELECT 'delete', old.id, old.yt_title, old.yt_channel_name, old.summary_text, decompress(body)
+  FROM summary_transcript WHERE summary_id = old.id;
+  INSERT INTO summary_fts (rowid, yt_title, yt_channel_name, summary_text, transcript)
+  SELECT new.id, new.yt_title, new.yt_channel_name, new.summary_text, decompress(body)
+  FROM summary_transcript WHERE summary_id = new.id;
+END;
+
 CREATE TABLE user_favorite_summary (
   user_id INTEGER NOT NULL,
   summary_id INTEGER NOT NULL,
@@ -38,6 +151,35 @@ CREATE TABLE user_favorite_summary (
   FOREIGN KEY (summary_id) REFERENCES summary (id)
 );
 
+CREATE INDEX idx_user_favorite_summary_summary_id ON user_favorite_summary (summary_id);
+
+CREATE TRIGGER favorite_version_insert AFTER INSERT ON user_favorite_summary BEGIN
+  UPDATE cache_version SET version = version + 1 WHERE name = 'favorite';
+END;
+
+CREATE TRIGGER favorite_version_delete AFTER DELETE ON user_favorite_summary BEGIN
+  UPDATE cache_version SET version = version + 1 WHERE name = 'favorite';
+END;
+
+CREATE TABLE job (
+  id INTEGER PRIMARY KEY AUTOINCREMENT,
+  author_id INTEGER NOT NULL,
+  category_id INTEGER NOT NULL,
+  yt_url TEXT NOT NULL,
+  video_id TEXT NOT NULL,
+  status TEXT NOT NULL DEFAULT 'queued',
+  error TEXT,
+  summary_id INTEGER,
+  created_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+  updated_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+  FOREIGN KEY (author_id) REFERENCES user (id),
+  FOREIGN KEY (category_id) REFERENCES category (id),
+  FOREIGN KEY (summary_id) REFERENCES summary (id)
+);
+
+CREATE INDEX idx_job_video_id ON job (video_id, status);
+CREATE INDEX idx_job_status ON job (status, id);
+
 -- Seed categories
 INSERT OR IGNORE INTO category (category_name, created_at)
 VALUES 
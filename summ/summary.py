@@ -1,120 +1,308 @@
+import hashlib
+import json
+import re
 import sqlite3
-from typing import List, Union
+import threading
+import time
+from typing import Any, Dict, List, Optional, Tuple, Union
 from flask import (
-    Blueprint, flash, g, redirect, render_template, request, url_for, Response
+    Blueprint, Flask, current_app, flash, g, make_response, redirect, render_template, request,
+    session, stream_template, url_for, Response
 )
+from markupsafe import Markup, escape
 from werkzeug.exceptions import abort
 
 from summ.auth import login_required
-from summ.db import get_db
-from summ.llm import get_transcript, extract_video_id, summarize_text, get_youtube_title, get_youtube_video_channel_name
+from summ.db import get_cache_versions, get_db, iter_transcript_text
+from summ.jobs import enqueue_job, find_pending_job, find_summary
+from summ.llm import extract_video_id
+from summ.transcript import format_timestamp
 
 bp = Blueprint('summary', __name__)
 
 
+# Markers for search matches in snippets, swapped for <mark> tags after escaping
+MATCH_START = '\x02'
+MATCH_END = '\x03'
+
+CURSOR_ID = re.compile(r'[0-9]{1,18}')
+# search results are paged by offset, further pages are treated as the first
+MAX_SEARCH_PAGE = 10_000
+
+
+def parse_cursor(cursor: str) -> Optional[Tuple[str, int]]:
+    """Split a "<created_at>,<id>" page cursor, ignoring malformed ones."""
+    created_at, _, id = cursor.rpartition(',')
+    # ASCII digits only, and few enough to fit in an SQLite integer
+    if not created_at or not CURSOR_ID.fullmatch(id):
+        return None
+    return created_at, int(id)
+
+
+def to_fts_query(search_query: str) -> str:
+    """Quote every search term so user input is never parsed as FTS5 syntax."""
+    # a NUL ends the query string early, leaving the last quote unterminated
+    terms = [''.join(ch for ch in term if ch.isprintable()) for term in search_query.split()]
+    return ' '.join('"' + term.replace('"', '""') + '"' for term in terms if term)
+
+
+def add_snippets(summaries: List[sqlite3.Row], fts_query: str) -> List[Dict[str, Any]]:
+    """
+    Add the search snippet of each summary on a page.
+
+    Snippets read the decompressed transcripts, so they are only made for the
+    rows of the page and not in the ranking query, which would make one for
+    every match before cutting the page.
+    """
+    ids = [row['id'] for row in summaries]
+    placeholders = ', '.join('?' * len(ids))
+    snippets = dict(get_db().execute(
+        f"SELECT rowid, snippet(summary_fts, -1, '{MATCH_START}', '{MATCH_END}', '…', 16)"
+        f' FROM summary_fts WHERE summary_fts MATCH ? AND rowid IN ({placeholders})',
+        [fts_query, *ids]
+    ).fetchall())
+    return [dict(row, snippet=snippets.get(row['id'])) for row in summaries]
+
+
+@bp.app_template_filter('highlight')
+def highlight(snippet: str) -> Markup:
+    """Escape a search snippet and mark up the matched terms."""
+    return escape(snippet).replace(MATCH_START, Markup('<mark>')).replace(
+        MATCH_END, Markup('</mark>'))
+
+
+@bp.app_template_filter('timestamp')
+def timestamp(seconds: Optional[float]) -> str:
+    """Format a position in the video as M:SS or H:MM:SS."""
+    return format_timestamp(seconds)
+
+
+class CategoryCache:
+    """
+    Process-wide copy of the category table.
+
+    The cache_version row of the table, bumped by triggers on every change,
+    is read at most once per ttl seconds, unless the caller already read it;
+    when another process changed the categories, they are loaded again.
+    invalidate() drops the copy at once.
+    """
+
+    def __init__(self, ttl: float) -> None:
+        self.ttl = ttl
+        self._categories: Optional[List[Dict[str, Any]]] = None
+        self._version: Optional[int] = None
+        self._checked_at = 0.0
+        self._lock = threading.Lock()
+
+    def get(self, db: sqlite3.Connection, version: Optional[int] = None) -> List[Dict[str, Any]]:
+        now = time.monotonic()
+        categories = self._categories
+        if categories is not None:
+            if version is None and now - self._checked_at < self.ttl:
+                return categories
+            if version is not None and version == self._version:
+                return categories
+
+        with self._lock:
+            if version is None:
+                version = db.execute(
+                    "SELECT version FROM cache_version WHERE name = 'category'").fetchone()[0]
+            if self._categories is None or version != self._version:
+                # read after the version, so a concurrent change only causes another reload
+                self._categories = [dict(row) for row in db.execute(
+                    'SELECT id, category_name FROM category ORDER BY id')]
+                self._version = version
+            self._checked_at = now
+            return self._categories
+
+    def invalidate(self) -> None:
+        with self._lock:
+            self._categories = None
+
+
+def get_categories(version: Optional[int] = None) -> List[Dict[str, Any]]:
+    """All categories, from the process-wide cache, given their version if it is known."""
+    return current_app.extensions['summ.categories'].get(get_db(), version)
+
+
+def invalidate_categories() -> None:
+    """Forget the cached categories, after changing them in this process."""
+    current_app.extensions['summ.categories'].invalidate()
+
+
+def page_etag(*versions: Any) -> Optional[str]:
+    """ETag of a page built from the data versions it shows, None if it must not be cached."""
+    if '_flashes' in session:
+        # the page shows (and consumes) flashed messages
+        return None
+    user_id = g.user['id'] if g.user else None
+    salt = current_app.extensions['summ.etag_salt']
+    key = json.dumps([salt, request.endpoint, user_id, *versions])
+    return hashlib.sha1(key.encode('utf8')).hexdigest()
+
+
+def with_etag(response: Response, etag: Optional[str]) -> Response:
+    """Let clients and proxies keep the page, but always revalidate it."""
+    if etag is not None:
+        response.set_etag(etag)
+        # pages of logged in users show their name, only their browser may keep those
+        response.headers['Cache-Control'] = 'private, no-cache' if g.user else 'public, no-cache'
+    return response
+
+
+def not_modified(etag: Optional[str]) -> Optional[Response]:
+    """A 304 response if the client's copy of the page is current, skipping the rendering."""
+    if etag is None or not request.if_none_match.contains_weak(etag):
+        return None
+    return with_etag(Response(status=304), etag)
+
+
 @bp.route('/')
-def index() -> str:
+def index() -> Response:
     db = get_db()
 
+    versions = get_cache_versions()
+    etag = page_etag(versions['summary'], versions['favorite'], versions['category'])
+    cached = not_modified(etag)
+    if cached is not None:
+        return cached
+
     category_filter = request.args.get('category', '')
     search_query = request.args.get('search', '')
+    fts_query = to_fts_query(search_query)
+    cursor = parse_cursor(request.args.get('before', ''))
+    page = request.args.get('page', 1, type=int)
+    if not 1 <= page <= MAX_SEARCH_PAGE:
+        # an OFFSET past SQLite's integer range would fail the query
+        page = 1
+    page_size = current_app.config['INDEX_PAGE_SIZE']
+
+    query, params = index_query(g.user['id'] if g.user else None, category_filter, fts_query,
+                                cursor, page, page_size)
+    summaries = db.execute(query, params).fetchall()
+
+    next_page = None
+    if len(summaries) > page_size:
+        summaries = summaries[:page_size]
+        last = summaries[-1]
+        if fts_query:
+            next_page = {'page': page + 1}
+        else:
+            next_page = {'before': f"{last['created_at']},{last['id']}"}
+
+    if fts_query and summaries:
+        summaries = add_snippets(summaries, fts_query)
+
+    return with_etag(make_response(render_template(
+        'summary/index.html',
+        summaries=summaries,
+        categories=get_categories(versions['category']),
+        selected_category=category_filter,
+        search_query=search_query,
+        next_page=next_page,
+        is_first_page=cursor is None and page <= 1
+    )), etag)
+
 
+def index_query(user_id: Optional[int], category_filter: str, fts_query: str,
+                cursor: Optional[Tuple[str, int]], page: int,
+                page_size: int) -> Tuple[str, List[Any]]:
+    """SQL and parameters of one page of the index, one row more to tell if there is a next."""
+    # the large transcript and summary columns are never shown in the listing
     query = '''
-    SELECT s.id, s.yt_url, s.yt_title, s.yt_channel_name, 
-           s.transcript, s.summary_text, s.author_id, 
-           s.created_at, u.username, c.category_name
-    FROM summary s 
+    SELECT s.id, s.yt_url, s.yt_title, s.yt_channel_name, s.author_id,
+           s.created_at, u.username, c.category_name, f.user_id IS NOT NULL AS is_favorite
+    '''
+
+    if fts_query:
+        query += """
+        FROM summary_fts
+        INNER JOIN summary s ON s.id = summary_fts.rowid
+        """
+    else:
+        query += ' FROM summary s'
+
+    # anonymous users match no favorites, the primary key makes this one lookup per row
+    query += '''
     INNER JOIN user u ON s.author_id = u.id
     INNER JOIN category c ON c.id = s.category_id
+    LEFT JOIN user_favorite_summary f ON f.summary_id = s.id AND f.user_id = ?
     WHERE 1=1
     '''
 
-    params = []
+    params: List[Any] = [user_id]
 
     if category_filter:
         query += ' AND c.category_name = ?'
         params.append(category_filter)
 
-    if search_query:
-        query += ' AND s.yt_title LIKE ?'
-        params.append(search_query)
-
-    query += ' ORDER BY s.created_at DESC'
+    if fts_query:
+        # ranked by relevance, titles weigh most and transcripts least
+        query += '''
+        AND summary_fts MATCH ?
+        ORDER BY bm25(summary_fts, 10.0, 5.0, 2.0, 1.0), s.id DESC
+        LIMIT ? OFFSET ?
+        '''
+        params.extend([fts_query, page_size + 1, (page - 1) * page_size])
+    else:
+        # keyset pagination: continue after the last row of the previous page
+        if cursor is not None:
+            query += ' AND (s.created_at, s.id) < (?, ?)'
+            params.extend(cursor)
 
-    summaries = db.execute(query, params).fetchall()
+        query += ' ORDER BY s.created_at DESC, s.id DESC LIMIT ?'
+        params.append(page_size + 1)
 
-    categories = db.execute(
-        'SELECT id, category_name FROM category').fetchall()
-
-    user_favorites: List[int] = []
-
-    if g.user:
-        user_favorites = [f['summary_id'] for f in db.execute(
-            'SELECT summary_id FROM user_favorite_summary WHERE user_id = ?',
-            (g.user['id'],)
-        ).fetchall()]
-
-    return render_template(
-        'summary/index.html',
-        summaries=summaries,
-        categories=categories,
-        selected_category=category_filter,
-        search_query=search_query,
-        user_favorites=user_favorites
-    )
+    return query, params
 
 
 @bp.route('/create', methods=('GET', 'POST'))
 @login_required
 def create() -> Union[str, Response]:
     db = get_db()
-    categories = db.execute(
-        'SELECT id, category_name FROM category').fetchall()
+    categories = get_categories()
 
     if request.method == 'POST':
         yt_url = request.form['yt_url']
         category_id = request.form['category_name']
         error = None
 
+        video_id = extract_video_id(yt_url)
+
         if not yt_url:
             error = 'Youtube URL is required'
+        elif video_id is None:
+            error = 'Not a valid YouTube video URL'
 
         if not category_id:
             error = 'Category is required'
 
         if error is not None:
             flash(error)
-        else:
-            try:
-                vid_id = extract_video_id(yt_url)
-                yt_title = get_youtube_title(yt_url)
-                yt_channel_name = get_youtube_video_channel_name(yt_url)
-                transcript = get_transcript(vid_id)
-                summary_text = summarize_text(text=transcript)
-
-                db.execute(
-                    'INSERT INTO summary (summary_text, transcript, yt_url, yt_title, yt_channel_name, author_id, category_id)'
-                    ' VALUES (?, ?, ?, ?, ?, ?, ?)',
-                    (summary_text, transcript, yt_url, yt_title, yt_channel_name, g.user['id'], category_id))
-                db.commit()
-                return redirect(url_for('summary.index'))
-
-            except sqlite3.IntegrityError:
-                existing_summary = db.execute(
-                    'SELECT * FROM summary WHERE yt_title = ?',
-                    (yt_title,)
-                ).fetchone()
-
-                if existing_summary:
-                    flash(f'A summary for "{yt_title}" already exists.')
-                    return render_template('summary/create.html', categories=categories)
+            return render_template('summary/create.html', categories=categories)
+
+        # catch duplicates before any network or model work is done
+        existing_summary = find_summary(video_id)
+        if existing_summary is not None:
+            flash(f'A summary for "{existing_summary["yt_title"]}" already exists.')
+            return render_template('summary/create.html', categories=categories)
+
+        pending_job = find_pending_job(video_id)
+        if pending_job is not None:
+            if pending_job['author_id'] == g.user['id']:
+                return redirect(url_for('jobs.status', id=pending_job['id']))
+            flash('This video is already being summarized.')
+            return render_template('summary/create.html', categories=categories)
+
+        job_id = enqueue_job(yt_url, video_id, g.user['id'], category_id)
+        return redirect(url_for('jobs.status', id=job_id))
 
     return render_template('summary/create.html', categories=categories)
 
 
 def get_summary(id: int, check_author: bool = True) -> dict:
     summary = get_db().execute(
-        'SELECT s.id, s.yt_url, s.yt_title, s.yt_channel_name, s.transcript, s.summary_text, s.author_id, s.created_at, u.username, c.category_name'
+        'SELECT s.id, s.yt_url, s.yt_title, s.video_id, s.yt_channel_name, s.summary_text, s.author_id, s.created_at, s.version, u.username, c.category_name'
         ' FROM summary s INNER JOIN user u ON s.author_id = u.id'
         ' INNER JOIN category c ON c.id = s.category_id'
         ' WHERE s.id = ?',
@@ -131,17 +319,47 @@ def get_summary(id: int, check_author: bool = True) -> dict:
 
 
 @bp.route('/detail/<int:id>', methods=('GET',))
-def detail(id: int) -> str:
+def detail(id: int) -> Response:
+    # only the version is needed to answer a conditional request
+    row = get_db().execute('SELECT version FROM summary WHERE id = ?', (id,)).fetchone()
+    if row is None:
+        abort(404, f"Summary id {id} doesn't exist.")
+    etag = page_etag(id, row['version'], get_cache_versions()['category'])
+    cached = not_modified(etag)
+    if cached is not None:
+        return cached
+
     summary = get_summary(id, check_author=False)
-    return render_template('summary/detail.html', summary=summary)
+    sections = get_db().execute(
+        'SELECT start_time, end_time, summary_text FROM summary_section'
+        ' WHERE summary_id = ? ORDER BY position',
+        (id,)
+    ).fetchall()
+    if '_flashes' in session:
+        # flashes are only removed from the session if the page is rendered
+        # before the session cookie is saved, which streaming comes too late for
+        return make_response(render_template(
+            'summary/detail.html',
+            summary=summary,
+            sections=sections,
+            transcript=iter_transcript_text(id)
+        ))
+
+    # the page is streamed, so the header and summary go out before the
+    # (possibly huge) transcript has even been decompressed
+    return with_etag(Response(stream_template(
+        'summary/detail.html',
+        summary=summary,
+        sections=sections,
+        transcript=iter_transcript_text(id)
+    )), etag)
 
 
 @bp.route('/update/<int:id>', methods=('GET', 'POST'))
 @login_required
 def update(id: int) -> Union[str, Response]:
     summary = get_summary(id)
-    categories = get_db().execute(
-        'SELECT id, category_name FROM category').fetchall()
+    categories = get_categories()
 
     if request.method == 'POST':
         yt_title = request.form['yt_title']
@@ -159,8 +377,8 @@ def update(id: int) -> Union[str, Response]:
         else:
             db = get_db()
             db.execute(
-                'UPDATE summary SET yt_title = ?, yt_channel_name = ?, summary_text = ?, category_id = ?'
-                ' WHERE id = ?',
+                'UPDATE summary SET yt_title = ?, yt_channel_name = ?, summary_text = ?, category_id = ?,'
+                ' version = version + 1 WHERE id = ?',
                 (yt_title, yt_channel_name, summary_text, category_id, id)
             )
             db.commit()
@@ -217,14 +435,8 @@ def remove_favorite(id: int) -> Response:
     return redirect(url_for('summary.favorites'))
 
 
-@bp.route('/favorites')
-@login_required
-def favorites() -> str:
-    db = get_db()
-
-    query = '''
-    SELECT s.id, s.yt_url, s.yt_title, s.yt_channel_name, 
-           s.transcript, s.summary_text, s.author_id, 
+FAVORITES_QUERY = '''
+    SELECT s.id, s.yt_url, s.yt_title, s.yt_channel_name, s.author_id,
            s.created_at, u.username, c.category_name
     FROM summary s 
     INNER JOIN user_favorite_summary uf ON s.id = uf.summary_id
@@ -234,9 +446,38 @@ def favorites() -> str:
     ORDER BY s.created_at DESC
     '''
 
-    favorites = db.execute(query, (g.user['id'],)).fetchall()
 
-    return render_template(
+@bp.route('/favorites')
+@login_required
+def favorites() -> Response:
+    db = get_db()
+
+    versions = get_cache_versions()
+    etag = page_etag(versions['summary'], versions['favorite'], versions['category'])
+    cached = not_modified(etag)
+    if cached is not None:
+        return cached
+
+    favorites = db.execute(FAVORITES_QUERY, (g.user['id'],)).fetchall()
+
+    return with_etag(make_response(render_template(
         'summary/favorites.html',
         summaries=favorites
-    )
+    )), etag)
+
+
+def templates_digest(app: Flask) -> str:
+    """Hash of all templates, so that pages cached by clients change with them."""
+    digest = hashlib.sha1()
+    for name in sorted(app.jinja_env.list_templates()):
+        source, _, _ = app.jinja_env.loader.get_source(app.jinja_env, name)
+        digest.update(name.encode('utf8') + b'\0' + source.encode('utf8'))
+    return digest.hexdigest()
+
+
+def init_app(app: Flask) -> None:
+    """Create the category cache and register the summary blueprint."""
+    app.extensions['summ.categories'] = CategoryCache(app.config['CATEGORY_CACHE_TTL'])
+    salt = app.config['PAGE_ETAG_SALT']
+    app.extensions['summ.etag_salt'] = salt if salt is not None else templates_digest(app)
+    app.register_blueprint(bp)
@@ -0,0 +1,116 @@
+import struct
+import sys
+from array import array
+from dataclasses import dataclass
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+
+class TranscriptSegments:
+    """
+    Timed caption segments packed into one text buffer and parallel arrays.
+
+    The text of all segments is stored once, joined with single spaces, so
+    `text` is the flattened transcript without any copying. Segment i spans
+    text[offsets[i]:offsets[i + 1] - 1]; its timing is starts[i] and
+    durations[i], in seconds.
+    """
+
+    def __init__(self, text: str, offsets: array, starts: array, durations: array) -> None:
+        self.text = text
+        self.offsets = offsets
+        self.starts = starts
+        self.durations = durations
+
+    @classmethod
+    def from_items(cls, items: Iterable[Dict[str, Any]]) -> 'TranscriptSegments':
+        """Build segments from YouTubeTranscriptApi items."""
+        texts: List[str] = []
+        offsets = array('I', [0])
+        starts = array('d')
+        durations = array('d')
+
+        for item in items:
+            texts.append(item['text'])
+            # +1 for the space that joins it to the next segment
+            offsets.append(offsets[-1] + len(item['text']) + 1)
+            starts.append(float(item.get('start', 0.0)))
+            durations.append(float(item.get('duration', 0.0)))
+
+        return cls(' '.join(texts), offsets, starts, durations)
+
+    def __len__(self) -> int:
+        return len(self.starts)
+
+    def segment_text(self, i: int) -> str:
+        return self.text[self.offsets[i]:self.offsets[i + 1] - 1]
+
+    def span_text(self, first: int, last: int) -> str:
+        """Text of segments first to last (inclusive) with a single slice."""
+        return self.text[self.offsets[first]:self.offsets[last + 1] - 1]
+
+    def time_range(self, first: int, last: int) -> Tuple[float, float]:
+        """Start and end time of segments first to last (inclusive)."""
+        return self.starts[first], self.starts[last] + self.durations[last]
+
+    def timings_to_bytes(self) -> bytes:
+        """Pack offsets and timings as little-endian binary for storage."""
+        arrays = [array('I', self.offsets), array('d', self.starts), array('d', self.durations)]
+        if sys.byteorder == 'big':
+            for values in arrays:
+                values.byteswap()
+        return struct.pack('<I', len(self)) + b''.join(values.tobytes() for values in arrays)
+
+    @classmethod
+    def from_bytes(cls, text: str, data: bytes) -> 'TranscriptSegments':
+        """Rebuild segments from the transcript text and timings_to_bytes data."""
+        (count,) = struct.unpack_from('<I', data)
+        offsets, starts, durations = array('I'), array('d'), array('d')
+        position = 4
+        for values, length in ((offsets, count + 1), (starts, count), (durations, count)):
+            end = position + length * values.itemsize
+            values.frombytes(data[position:end])
+            position = end
+        if sys.byteorder == 'big':
+            for values in (offsets, starts, durations):
+                values.byteswap()
+        return cls(text, offsets, starts, durations)
+
+    def to_dict(self) -> Dict[str, Any]:
+        """JSON-serializable form, used by the on-disk cache."""
+        return {
+            'text': self.text,
+            'offsets': self.offsets.tolist(),
+            'starts': self.starts.tolist(),
+            'durations': self.durations.tolist(),
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> 'TranscriptSegments':
+        return cls(data['text'], array('I', data['offsets']),
+                   array('d', data['starts']), array('d', data['durations']))
+
+
+@dataclass(frozen=True)
+class TranscriptChunk:
+    """Model input made of consecutive segments and the time range they cover"""
+    text: str
+    start: float
+    end: float
+
+
+@dataclass(frozen=True)
+class SectionSummary:
+    """Summary of one chunk of a transcript and the time range it covers"""
+    start: float
+    end: float
+    summary_text: str
+
+
+def format_timestamp(seconds: Optional[float]) -> str:
+    """Format seconds as M:SS or H:MM:SS, like YouTube does."""
+    total = int(seconds or 0)
+    hours, rest = divmod(total, 3600)
+    minutes, secs = divmod(rest, 60)
+    if hours:
+        return f'{hours}:{minutes:02d}:{secs:02d}'
+    return f'{minutes}:{secs:02d}'
@@ -1,6 +1,7 @@
+import contextlib
 import os
 import tempfile
-from typing import Generator
+from typing import Callable, ContextManager, Generator, List
 
 import pytest
 from flask import Flask, Response
@@ -16,10 +17,15 @@ with open(os.path.join(os.path.dirname(__file__), 'data.sql'), 'rb') as f:
 @pytest.fixture
 def app() -> Generator[Flask, None, None]:
     db_fd, db_path = tempfile.mkstemp()
+    cache_fd, cache_path = tempfile.mkstemp()
 
     app = create_app({
         'TESTING': True,
         'DATABASE': db_path,
+        'CACHE_PATH': cache_path,
+        'JOB_WORKERS': 0,
+        # the method of the hashes in data.sql, so logins don't rehash
+        'PASSWORD_HASH_METHOD': 'pbkdf2:sha256:50000',
     })
 
     with app.app_context():
@@ -30,6 +36,11 @@ def app() -> Generator[Flask, None, None]:
 
     os.close(db_fd)
     os.unlink(db_path)
+    for suffix in ('-wal', '-shm'):
+        if os.path.exists(db_path + suffix):
+            os.unlink(db_path + suffix)
+    os.close(cache_fd)
+    os.unlink(cache_path)
 
 
 @pytest.fixture
@@ -59,3 +70,20 @@ class AuthActions:
 @pytest.fixture
 def auth(client: FlaskClient) -> AuthActions:
     return AuthActions(client)
+
+
+@pytest.fixture
+def trace_sql(app: Flask) -> Callable[[], ContextManager[List[str]]]:
+    """Collect the SQL statements run while the returned context manager is open."""
+    @contextlib.contextmanager
+    def trace() -> Generator[List[str], None, None]:
+        statements: List[str] = []
+        with app.app_context():
+            db = get_db()
+            db.set_trace_callback(statements.append)
+            try:
+                yield statements
+            finally:
+                db.set_trace_callback(None)
+
+    return trace
@@ -6,10 +6,22 @@ VALUES
 
 
 INSERT INTO summary
-    (yt_url, yt_title, yt_channel_name, transcript, summary_text, author_id, category_id, created_at)
+    (yt_url, yt_title, video_id, yt_channel_name, summary_text, author_id, category_id, created_at)
 VALUES
-    ('https://www.youtube.com/watch?v=dQw4w9WgXcQ', 'fake title', 'RLM', 'fake transcript', 'fake summary', 1, 1, '2024-11-11 00:00:00'),
-    ('https://www.youtube.com/watch?v=cNsTMNxOzqQ', 'fake title2', 'PT', 'fake transcript2', 'fake summary2', 2, 2, '2024-11-12 00:00:00');
+    ('https://www.youtube.com/watch?v=dQw4w9WgXcQ', 'fake title', 'dQw4w9WgXcQ', 'RLM', 'fake summary', 1, 1, '2024-11-11 00:00:00'),
+    ('https://www.youtube.com/watch?v=cNsTMNxOzqQ', 'fake title2', 'cNsTMNxOzqQ', 'PT', 'fake summary2', 2, 2, '2024-11-12 00:00:00');
+
+INSERT INTO summary_transcript
+    (summary_id, body)
+VALUES
+    (1, compress('fake transcript')),
+    (2, compress('fake transcript2'));
+
+INSERT INTO summary_section
+    (summary_id, position, start_time, end_time, summary_text)
+VALUES
+    (1, 0, 0.0, 95.5, 'fake section'),
+    (1, 1, 90.0, 3725.0, 'fake section2');
 
 INSERT INTO user_favorite_summary
     (user_id, summary_id, created_at)
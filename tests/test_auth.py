@@ -1,6 +1,11 @@
+import threading
 import pytest
 from flask import Flask, g, session
 from flask.testing import FlaskClient
+from typing import Any
+
+import summ.auth
+from summ.auth import PasswordHasher, UserCache
 from summ.db import get_db
 
 
@@ -63,3 +68,113 @@ def test_logout(client: FlaskClient, auth: object) -> None:
     with client:
         auth.logout()
         assert 'user_id' not in session
+
+
+def test_logged_in_user_cached(client: FlaskClient, auth: object, app: Flask,
+                               mocker: Any) -> None:
+    auth.login()
+    get_db_spy = mocker.spy(summ.auth, 'get_db')
+
+    with client:
+        client.get('/auth/login')
+        assert g.user == {'id': 1, 'username': 'test'}
+    get_db_spy.assert_not_called()
+
+    # a logout drops the entry, so the next login reads the user again
+    auth.logout()
+    with app.app_context():
+        assert app.extensions['summ.users'].get(1) is None
+
+
+def test_logged_in_user_expires(client: FlaskClient, auth: object, app: Flask) -> None:
+    app.extensions['summ.users'].ttl = 0
+    auth.login()
+    with app.app_context():
+        get_db().execute('DELETE FROM user WHERE id = 1')
+        get_db().commit()
+
+    with client:
+        client.get('/auth/login')
+        assert g.user is None
+
+
+def test_user_cache_drops_expired_and_least_recent() -> None:
+    cache = UserCache(ttl=0, max_size=2)
+    cache.set({'id': 1, 'username': 'a'})
+    # entries that expired are dropped, not just replaced by a later set()
+    cache.ttl = 60
+    cache.set({'id': 2, 'username': 'b'})
+    assert len(cache) == 1
+
+    for id in (3, 4, 3, 5):
+        cache.set({'id': id, 'username': str(id)})
+    assert len(cache) == 2
+    assert cache.get(4) is None
+    assert cache.get(3) == {'id': 3, 'username': '3'}
+    assert cache.get(5) is not None
+
+
+def test_anonymous_request_skips_db(client: FlaskClient, mocker: Any) -> None:
+    get_db_spy = mocker.spy(summ.auth, 'get_db')
+
+    with client:
+        client.get('/auth/login')
+        assert g.user is None
+    get_db_spy.assert_not_called()
+
+
+def test_login_rehashes_old_password(client: FlaskClient, auth: object, app: Flask) -> None:
+    app.extensions['summ.hasher'].method = 'pbkdf2:sha256:60000'
+
+    assert auth.login().headers['Location'] == '/'
+
+    with app.app_context():
+        pwhash = get_db().execute('SELECT password FROM user WHERE id = 1').fetchone()[0]
+    assert pwhash.startswith('pbkdf2:sha256:60000$')
+    auth.logout()
+    assert auth.login().headers['Location'] == '/'
+
+
+def test_login_hasher_busy(client: FlaskClient, app: Flask) -> None:
+    hasher = PasswordHasher('pbkdf2:sha256:1000', workers=1, queue_depth=0)
+    app.extensions['summ.hasher'] = hasher
+    started, release = threading.Event(), threading.Event()
+
+    def blocking_hash() -> None:
+        started.set()
+        release.wait(5)
+
+    busy = threading.Thread(target=hasher._run, args=(blocking_hash,))
+    busy.start()
+    started.wait(5)
+    try:
+        response = client.post('/auth/login', data={'username': 'test', 'password': 'test'})
+    finally:
+        release.set()
+        busy.join()
+
+    assert response.status_code == 503
+    assert response.headers['Retry-After'] == '1'
+    assert client.post('/auth/login', data={'username': 'test', 'password': 'test'}
+                       ).status_code == 302
+
+
+def test_needs_rehash_never_takes_a_slot() -> None:
+    hasher = PasswordHasher('pbkdf2:sha256:1000', workers=1, queue_depth=0)
+    started, release = threading.Event(), threading.Event()
+
+    def blocking_hash() -> None:
+        started.set()
+        release.wait(5)
+
+    busy = threading.Thread(target=hasher._run, args=(blocking_hash,))
+    busy.start()
+    started.wait(5)
+    try:
+        # every slot is taken, yet a successful login can still tell if it must rehash
+        assert not hasher.needs_rehash('pbkdf2:sha256:1000$salt$hash')
+        assert hasher.needs_rehash('pbkdf2:sha256:50000$salt$hash')
+    finally:
+        release.set()
+        busy.join()
+        hasher.shutdown()
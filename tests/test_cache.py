@@ -0,0 +1,58 @@
+import os
+import tempfile
+from typing import Any, Generator
+
+import pytest
+from summ.cache import DiskCache
+
+
+@pytest.fixture
+def cache_path() -> Generator[str, None, None]:
+    fd, path = tempfile.mkstemp()
+    yield path
+    os.close(fd)
+    os.unlink(path)
+
+
+def test_get_set(cache_path: str) -> None:
+    cache = DiskCache(cache_path, ttl=60, max_bytes=1024)
+    assert cache.get('transcript', 'abc') is None
+
+    cache.set('transcript', 'abc', 'some text')
+    cache.set('metadata', 'abc', {'title': 'Title'})
+
+    assert cache.get('transcript', 'abc') == 'some text'
+    assert cache.get('metadata', 'abc') == {'title': 'Title'}
+
+    cache.delete('transcript', 'abc')
+    assert cache.get('transcript', 'abc') is None
+
+
+def test_expired_entries(cache_path: str, mocker: Any) -> None:
+    cache = DiskCache(cache_path, ttl=60, max_bytes=1024)
+    mocker.patch('summ.cache.time.time', return_value=1000.0)
+    cache.set('transcript', 'abc', 'some text')
+
+    mocker.patch('summ.cache.time.time', return_value=1059.0)
+    assert cache.get('transcript', 'abc') == 'some text'
+
+    mocker.patch('summ.cache.time.time', return_value=1061.0)
+    assert cache.get('transcript', 'abc') is None
+
+
+def test_lru_eviction(cache_path: str, mocker: Any) -> None:
+    # every entry is 12 bytes of JSON, so only two fit
+    cache = DiskCache(cache_path, ttl=60, max_bytes=24)
+    clock = mocker.patch('summ.cache.time.time', return_value=1.0)
+    cache.set('t', 'a', 'aaaaaaaaaa')
+    clock.return_value = 2.0
+    cache.set('t', 'b', 'bbbbbbbbbb')
+    clock.return_value = 3.0
+    assert cache.get('t', 'a') is not None
+
+    clock.return_value = 4.0
+    cache.set('t', 'c', 'cccccccccc')
+
+    assert cache.get('t', 'a') == 'aaaaaaaaaa'
+    assert cache.get('t', 'b') is None
+    assert cache.get('t', 'c') == 'cccccccccc'
@@ -1,14 +1,22 @@
+import os
 import sqlite3
-from typing import Generator
+import threading
+from typing import Any, Generator, Sequence, Set, Tuple
 
 import pytest
 from flask import Flask
 from flask.testing import FlaskCliRunner
-from summ.db import get_db
+from summ.db import (
+    compress_text, decompress_text, get_db, get_schema_version, get_transcript_text,
+    iter_transcript_text, list_migrations, migrate_db
+)
+from summ.summary import FAVORITES_QUERY, index_query
 
 
 def test_get_close_db(app: Flask) -> None:
     """Test that the database is reused within the same context and closed after use."""
+    app.config['DATABASE_POOL'] = False
+
     with app.app_context():
         db = get_db()
         assert db is get_db()
@@ -19,6 +27,46 @@ def test_get_close_db(app: Flask) -> None:
     assert 'closed' in str(e.value)
 
 
+def test_pooled_db_reused(app: Flask) -> None:
+    """Test that pooled connections stay open and are reused by the same thread."""
+    with app.app_context():
+        db = get_db()
+        db.execute("INSERT INTO category (category_name) VALUES ('uncommitted')")
+
+    with app.app_context():
+        assert get_db() is db
+        assert db.execute(
+            "SELECT COUNT(*) FROM category WHERE category_name = 'uncommitted'"
+        ).fetchone()[0] == 0
+
+
+def test_pooled_db_per_thread(app: Flask) -> None:
+    """Test that threads never share a pooled connection."""
+    connections = []
+
+    def use_db() -> None:
+        with app.app_context():
+            connections.append(get_db())
+
+    with app.app_context():
+        db = get_db()
+
+    thread = threading.Thread(target=use_db)
+    thread.start()
+    thread.join()
+
+    assert connections[0] is not db
+
+
+def test_pragmas(app: Flask) -> None:
+    """Test that connections are configured for concurrent reads."""
+    with app.app_context():
+        db = get_db()
+        assert db.execute('PRAGMA journal_mode').fetchone()[0] == 'wal'
+        assert db.execute('PRAGMA synchronous').fetchone()[0] == 1
+        assert db.execute('PRAGMA busy_timeout').fetchone()[0] == 5000
+
+
 def test_init_db_command(runner: FlaskCliRunner, monkeypatch: pytest.MonkeyPatch) -> None:
     """Test the 'init-db' command functionality."""
     class Recorder:
@@ -33,3 +81,146 @@ def test_init_db_command(runner: FlaskCliRunner, monkeypatch: pytest.MonkeyPatch
 
     assert 'Initialized' in result.output
     assert Recorder.called
+
+
+with open(os.path.join(os.path.dirname(__file__), 'schema_v0.sql'), 'rb') as f:
+    _schema_v0_sql = f.read().decode('utf8')
+
+
+def schema_objects(db: sqlite3.Connection) -> Set[Tuple[str, str]]:
+    return {(row['type'], row['name']) for row in db.execute(
+        "SELECT type, name FROM sqlite_master WHERE name NOT LIKE 'sqlite_%'")}
+
+
+def test_migrate_db_from_first_schema(app: Flask) -> None:
+    """Test that migrations bring an old database to the current schema, keeping data."""
+    with app.app_context():
+        db = get_db()
+        current_schema = schema_objects(db)
+
+        db.executescript(
+            'DROP VIEW summary_document; DROP TABLE summary_fts; DROP TABLE summary_transcript;'
+            'DROP TABLE summary_section; DROP TABLE cache_version;'
+            'DROP TABLE job; PRAGMA user_version = 0;'
+        )
+        db.executescript(_schema_v0_sql)
+        db.executescript(
+            "INSERT INTO user (username, password) VALUES ('test', 'x');"
+            "INSERT INTO summary (yt_url, yt_title, transcript, summary_text, author_id, category_id)"
+            " VALUES ('https://youtu.be/dQw4w9WgXcQ', 'old title', 'old transcript', 'old summary', 1, 1),"
+            "        ('https://www.youtube.com/watch?v=dQw4w9WgXcQ', 'same video', 't', 's', 1, 1);"
+        )
+
+        applied = migrate_db()
+
+        assert applied == [name for _, name in list_migrations()]
+        assert get_schema_version(db) == list_migrations()[-1][0]
+        assert schema_objects(db) == current_schema
+        assert [tuple(row) for row in db.execute(
+            'SELECT yt_title, video_id FROM summary ORDER BY id')] == [
+            ('old title', 'dQw4w9WgXcQ'), ('same video', None)]
+        assert db.execute(
+            "SELECT rowid FROM summary_fts WHERE summary_fts MATCH 'transcript'"
+        ).fetchone()[0] == 1
+        assert get_transcript_text(1) == 'old transcript'
+
+        assert migrate_db() == []
+
+
+def test_migrate_db_command(runner: FlaskCliRunner) -> None:
+    """Test that a freshly initialized database needs no migrations."""
+    result = runner.invoke(args=['migrate-db'])
+
+    assert 'Applied' not in result.output
+    assert 'up to date' in result.output
+
+
+def explain(query: str, params: Sequence[Any] = ()) -> str:
+    return ' '.join(row['detail'] for row in get_db().execute(
+        f'EXPLAIN QUERY PLAN {query}', params))
+
+
+@pytest.mark.parametrize(('category', 'cursor', 'index'), [
+    ('', None, 'idx_summary_created_at'),
+    ('', ('2024-11-12 00:00:00', 2), 'idx_summary_created_at (created_at<?)'),
+    ('Science', None, 'idx_summary_category_id (category_id=?)'),
+])
+def test_index_page_uses_indexes(app: Flask, category: str, cursor: Any, index: str) -> None:
+    """Test that the query of the index view reads a page in index order."""
+    with app.app_context():
+        plan = explain(*index_query(1, category, '', cursor, 1, 50))
+
+    assert index in plan
+    assert 'SCAN u' not in plan and 'SCAN c' not in plan and 'SCAN f' not in plan
+    assert 'TEMP B-TREE' not in plan
+
+
+def test_favorites_use_indexes(app: Flask) -> None:
+    """Test that the favorites view only reads the favorites of its user."""
+    with app.app_context():
+        plan = explain(FAVORITES_QUERY, (1,))
+
+    # one user's favorites are few, sorting them is cheap
+    assert 'SEARCH uf USING COVERING INDEX sqlite_autoindex_user_favorite_summary_1 (user_id=?)' \
+        in plan
+    assert 'SCAN' not in plan
+
+
+@pytest.mark.parametrize(('query', 'index'), [
+    ('SELECT id FROM summary WHERE author_id = 1',
+     'idx_summary_author_id'),
+    ('SELECT user_id FROM user_favorite_summary WHERE summary_id = 1',
+     'idx_user_favorite_summary_summary_id'),
+    ("SELECT id FROM job WHERE status = 'queued' ORDER BY id LIMIT 1",
+     'idx_job_status'),
+    ("SELECT id FROM summary WHERE video_id = 'dQw4w9WgXcQ'",
+     'idx_summary_video_id'),
+])
+def test_hot_queries_use_indexes(app: Flask, query: str, index: str) -> None:
+    """Test that the frequent queries are answered from an index without sorting."""
+    with app.app_context():
+        plan = explain(query)
+
+    assert index in plan
+    assert 'TEMP B-TREE' not in plan
+
+
+def test_compress_text_roundtrip() -> None:
+    text = 'never gonna give you up ' * 100
+
+    data = compress_text(text)
+
+    assert len(data) < len(text) / 10
+    assert decompress_text(data) == text
+    assert compress_text(None) is None
+    assert decompress_text(None) is None
+
+
+def test_transcripts_stored_compressed(app: Flask) -> None:
+    """Test that the summary table no longer holds transcripts and deletes clean up."""
+    with app.app_context():
+        db = get_db()
+        columns = [row['name'] for row in db.execute('PRAGMA table_info(summary)')]
+        assert 'transcript' not in columns
+        assert get_transcript_text(2) == 'fake transcript2'
+
+        db.execute('DELETE FROM summary WHERE id = 2')
+        db.commit()
+        assert get_transcript_text(2) is None
+
+
+def test_iter_transcript_text(app: Flask) -> None:
+    """Test that transcripts decompress in bounded pieces without splitting characters."""
+    transcript = 'zażółć gęślą jaźń ' * 10000
+    with app.app_context():
+        db = get_db()
+        db.execute('UPDATE summary_transcript SET body = ? WHERE summary_id = 1',
+                   (compress_text(transcript),))
+
+        parts = list(iter_transcript_text(1, chunk_size=1000))
+
+        assert len(parts) > 1
+        # a piece may carry up to 3 bytes of a character cut by the previous one
+        assert all(len(part.encode('utf8')) < 1000 + 4 for part in parts)
+        assert ''.join(parts) == transcript
+        assert list(iter_transcript_text(1000)) == []
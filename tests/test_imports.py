@@ -0,0 +1,28 @@
+import os
+import re
+import subprocess
+import sys
+
+
+# microseconds; importing torch and transformers alone takes several seconds
+IMPORT_BUDGET_US = 2_000_000
+HEAVY_MODULES = ('torch', 'transformers')
+
+
+def test_import_summ_is_light() -> None:
+    """Importing the app must not pull in the ML stack and stay within budget."""
+    code = ('import sys, summ; '
+            f'print([m for m in {HEAVY_MODULES!r} if m in sys.modules])')
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', code],
+        cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+        capture_output=True, text=True, check=True,
+    )
+
+    assert result.stdout.strip() == '[]'
+    # lines look like "import time:  self [us] | cumulative | imported package"
+    cumulative = [int(match.group(1)) for match in
+                  re.finditer(r'^import time:\s+\d+ \|\s+(\d+) \| summ$',
+                              result.stderr, re.MULTILINE)]
+    assert len(cumulative) == 1
+    assert cumulative[0] < IMPORT_BUDGET_US
@@ -0,0 +1,123 @@
+import threading
+import pytest
+from flask import Flask
+from flask.testing import FlaskClient
+from typing import Any, List, Set
+from unittest.mock import MagicMock
+
+from summ import create_app
+from summ.inference import (
+    InferencePool, LocalInference, reduce_summaries, split_cores, summarize_segments
+)
+from summ.transcript import SectionSummary, TranscriptSegments
+
+
+@pytest.mark.parametrize('cores,count,expected', [
+    ({0, 1, 2, 3}, 2, [{0, 1}, {2, 3}]),
+    ({0, 2, 4, 6, 8}, 2, [{0, 2, 4}, {6, 8}]),
+    ({0, 1}, 1, [{0, 1}]),
+    ({0}, 2, []),
+])
+def test_split_cores(cores: Set[int], count: int, expected: List[Set[int]]) -> None:
+    assert split_cores(cores, count) == expected
+
+
+def test_create_app_never_loads_model(mocker: Any) -> None:
+    get_summarizer = mocker.patch('summ.llm.get_summarizer')
+
+    pooled = create_app({'TESTING': True, 'INFERENCE_WORKERS': 2})
+    local = create_app({'TESTING': True})
+
+    get_summarizer.assert_not_called()
+    pool = pooled.extensions['summ.inference']
+    assert isinstance(pool, InferencePool)
+    # processes are only spawned when the pool is started
+    assert pool._executor is None
+    assert pool.status == 'idle'
+    assert isinstance(local.extensions['summ.inference'], LocalInference)
+    assert local.extensions['summ.inference'].status == 'idle'
+
+
+def test_preload_in_background(mocker: Any) -> None:
+    loaded = threading.Event()
+    summarizer = MagicMock()
+
+    def slow_load(*args: Any) -> MagicMock:
+        loaded.wait(5)
+        return summarizer
+
+    mocker.patch('summ.llm.get_summarizer', side_effect=slow_load)
+    app = create_app({'TESTING': False, 'JOB_WORKERS': 0, 'MODEL_WARMUP': True})
+    inference = app.extensions['summ.inference']
+    client = app.test_client()
+
+    response = client.get('/ready')
+    assert response.status_code == 503
+    assert response.json == {'status': 'loading'}
+
+    loaded.set()
+    assert inference.load() is summarizer
+    summarizer.assert_called_once()  # the warm-up inference
+    response = client.get('/ready')
+    assert response.status_code == 200
+    assert response.json == {'status': 'ready'}
+
+
+def test_ready_starts_loading(client: FlaskClient, app: Flask, mocker: Any) -> None:
+    mocker.patch('summ.llm.get_summarizer', return_value=None)
+
+    assert app.extensions['summ.inference'].status == 'idle'
+    client.get('/ready')
+    app.extensions['summ.inference'].load()
+
+    response = client.get('/ready')
+    assert response.status_code == 503
+    assert response.json == {'status': 'failed'}
+
+
+def test_ready_reports_missing_torch(client: FlaskClient, app: Flask, mocker: Any) -> None:
+    mocker.patch.dict('sys.modules', {'torch': None})
+    inference = app.extensions['summ.inference']
+
+    assert client.get('/ready').status_code == 503
+    # waits for the background load started by the probe
+    assert inference.load() is None
+    assert inference.status == 'failed'
+
+
+def test_dispatch_in_process(app: Flask, mocker: Any) -> None:
+    summarizer = MagicMock()
+    mocker.patch('summ.llm.get_summarizer', return_value=summarizer)
+    local = mocker.patch('summ.llm.summarize_segments', return_value=[])
+    segments = TranscriptSegments.from_items([{'text': 'Hi'}])
+
+    with app.app_context():
+        assert summarize_segments(segments, batch_size=2) == []
+
+    local.assert_called_once_with(segments, summarizer=summarizer, batch_size=2)
+
+
+def test_reduce_without_model_when_summaries_fit(app: Flask, mocker: Any) -> None:
+    get_summarizer = mocker.patch('summ.llm.get_summarizer', return_value=None)
+    mocker.patch('summ.llm.get_tokenizer', return_value=None)
+
+    with app.app_context():
+        assert reduce_summaries(['one two', 'three'], 10) == ('one two three', True)
+
+    get_summarizer.assert_not_called()
+    assert app.extensions['summ.inference'].status == 'idle'
+
+
+def test_dispatch_to_pool(app: Flask, mocker: Any) -> None:
+    pool = mocker.MagicMock()
+    pool.summarize_segments.return_value = [SectionSummary(0.0, 1.0, 'Hi')]
+    pool.reduce_summaries.return_value = ('Hi', True)
+    app.extensions['summ.inference'] = pool
+    segments = TranscriptSegments.from_items([{'text': 'Hi'}])
+
+    with app.app_context():
+        assert summarize_segments(segments, batch_size=2) == [SectionSummary(0.0, 1.0, 'Hi')]
+        assert reduce_summaries(['Hi'], 10, max_calls=3) == ('Hi', True)
+
+    pool.summarize_segments.assert_called_once_with(segments, batch_size=2)
+    pool.reduce_summaries.assert_called_once_with(['Hi'], 10, max_calls=3)
@@ -0,0 +1,308 @@
+import sqlite3
+import pytest
+from flask import Flask
+from flask.testing import FlaskClient
+from summ.db import get_db, get_transcript_segments
+from summ.jobs import JobWorkers, claim_job, renew_jobs, requeue_interrupted_jobs, run_job
+from summ.llm import VideoMetadata
+from summ.transcript import SectionSummary, TranscriptSegments
+from typing import Any
+
+
+@pytest.fixture
+def mock_youtube(mocker: Any) -> None:
+    mocker.patch('summ.jobs.get_video_metadata', return_value=VideoMetadata(
+        title='Test Video Title', channel_name='Test Channel'))
+    mocker.patch('summ.jobs.fetch_transcript_segments', return_value=TranscriptSegments.from_items([
+        {'text': 'Test', 'start': 0.0, 'duration': 2.0},
+        {'text': 'transcript', 'start': 2.0, 'duration': 3.5}]))
+    mocker.patch('summ.jobs.summarize_segments', return_value=[
+        SectionSummary(0.0, 5.5, 'Test summary')])
+    # the section summaries already fit, as if no model was needed to condense them
+    mocker.patch('summ.jobs.reduce_summaries',
+                 side_effect=lambda summaries, *args, **kwargs: (' '.join(summaries), True))
+
+
+def test_create_enqueues_and_runs_job(client: FlaskClient, auth: object, app: Flask,
+                                      mock_youtube: None) -> None:
+    auth.login()
+    response = client.post('/create', data={
+        'yt_url': 'https://www.youtube.com/watch?v=MGXSPf9b-xI',
+        'category_name': 2})
+    assert response.headers['Location'] == '/jobs/1'
+
+    with app.app_context():
+        db = get_db()
+        job = db.execute('SELECT * FROM job WHERE id = 1').fetchone()
+        assert job['status'] == 'done'
+        summary = db.execute('SELECT * FROM summary WHERE id = ?',
+                             (job['summary_id'],)).fetchone()
+        assert summary['summary_text'] == 'Test summary'
+        assert summary['author_id'] == 1
+        sections = db.execute('SELECT * FROM summary_section WHERE summary_id = ?',
+                              (summary['id'],)).fetchall()
+        assert [(row['start_time'], row['end_time']) for row in sections] == [(0.0, 5.5)]
+
+        segments = get_transcript_segments(summary['id'])
+        assert segments.text == 'Test transcript'
+        assert segments.time_range(1, 1) == (2.0, 5.5)
+
+    response = client.get('/jobs/1')
+    assert b'Your summary is ready' in response.data
+
+
+def test_job_status_json(client: FlaskClient, auth: object, mock_youtube: None) -> None:
+    auth.login()
+    client.post('/create', data={
+        'yt_url': 'https://www.youtube.com/watch?v=MGXSPf9b-xI',
+        'category_name': 2})
+
+    response = client.get('/jobs/1', headers={'Accept': 'application/json'})
+    assert response.json['status'] == 'done'
+    assert response.json['summary_id'] == 3
+
+
+def test_job_duplicate_title_fails(client: FlaskClient, auth: object, app: Flask,
+                                   mock_youtube: None, mocker: Any) -> None:
+    mocker.patch('summ.jobs.get_video_metadata',
+                 return_value=VideoMetadata(title='fake title'))
+    auth.login()
+    client.post('/create', data={
+        'yt_url': 'https://www.youtube.com/watch?v=MGXSPf9b-xI',
+        'category_name': 2})
+
+    with app.app_context():
+        job = get_db().execute('SELECT * FROM job WHERE id = 1').fetchone()
+        assert job['status'] == 'failed'
+        assert 'already exists' in job['error']
+
+    assert b'already exists' in client.get('/jobs/1').data
+
+
+def test_job_metadata_unavailable(client: FlaskClient, auth: object, app: Flask,
+                                  mock_youtube: None, mocker: Any) -> None:
+    mocker.patch('summ.jobs.get_video_metadata', return_value=None)
+    auth.login()
+    client.post('/create', data={
+        'yt_url': 'https://www.youtube.com/watch?v=MGXSPf9b-xI',
+        'category_name': 2})
+
+    with app.app_context():
+        job = get_db().execute('SELECT * FROM job WHERE id = 1').fetchone()
+        assert job['status'] == 'failed'
+        assert 'video details' in job['error']
+
+
+def test_job_without_target_joins_sections(client: FlaskClient, auth: object, app: Flask,
+                                          mock_youtube: None, mocker: Any) -> None:
+    app.config['SUMMARY_TARGET_TOKENS'] = None
+    reduce = mocker.patch('summ.jobs.reduce_summaries')
+    mocker.patch('summ.jobs.summarize_segments', return_value=[
+        SectionSummary(0.0, 5.0, 'one two'), SectionSummary(5.0, 9.0, 'three four')])
+    auth.login()
+    client.post('/create', data={
+        'yt_url': 'https://www.youtube.com/watch?v=MGXSPf9b-xI',
+        'category_name': 2})
+
+    reduce.assert_not_called()
+    with app.app_context():
+        assert get_db().execute('SELECT summary_text FROM summary WHERE id = 3').fetchone()[0] == \
+            'one two three four'
+
+
+def test_create_duplicate_skips_all_work(client: FlaskClient, auth: object, app: Flask,
+                                         mocker: Any) -> None:
+    metadata = mocker.patch('summ.jobs.get_video_metadata')
+    auth.login()
+    response = client.post('/create', data={
+        'yt_url': 'https://youtu.be/dQw4w9WgXcQ?t=42',
+        'category_name': 2})
+
+    assert b'A summary for &#34;fake title&#34; already exists.' in response.data
+    metadata.assert_not_called()
+    with app.app_context():
+        assert get_db().execute('SELECT COUNT(*) FROM job').fetchone()[0] == 0
+
+
+def test_create_pending_job_reused(client: FlaskClient, auth: object, app: Flask) -> None:
+    with app.app_context():
+        db = get_db()
+        db.executemany(
+            "INSERT INTO job (yt_url, video_id, author_id, category_id) VALUES (?, ?, ?, 1)",
+            [('https://youtu.be/aaaaaaaaaaa', 'aaaaaaaaaaa', 1),
+             ('https://youtu.be/bbbbbbbbbbb', 'bbbbbbbbbbb', 2)])
+        db.commit()
+
+    auth.login()
+    response = client.post('/create', data={
+        'yt_url': 'https://www.youtube.com/watch?v=aaaaaaaaaaa',
+        'category_name': 2})
+    assert response.headers['Location'] == '/jobs/1'
+
+    response = client.post('/create', data={
+        'yt_url': 'https://www.youtube.com/watch?v=bbbbbbbbbbb',
+        'category_name': 2})
+    assert b'already being summarized' in response.data
+
+    with app.app_context():
+        assert get_db().execute('SELECT COUNT(*) FROM job').fetchone()[0] == 2
+
+
+def test_create_invalid_url(client: FlaskClient, auth: object) -> None:
+    auth.login()
+    response = client.post('/create', data={
+        'yt_url': 'https://example.com/video',
+        'category_name': 2})
+    assert b'Not a valid YouTube video URL' in response.data
+
+
+def test_job_status_author_required(client: FlaskClient, auth: object, app: Flask) -> None:
+    with app.app_context():
+        db = get_db()
+        db.execute(
+            "INSERT INTO job (yt_url, video_id, author_id, category_id)"
+            " VALUES ('url', 'MGXSPf9b-xI', 2, 1)")
+        db.commit()
+
+    auth.login()
+    assert client.get('/jobs/1').status_code == 403
+    assert client.get('/jobs/2').status_code == 404
+
+
+def test_claim_job_oldest_first(app: Flask) -> None:
+    with app.app_context():
+        db = get_db()
+        db.executemany(
+            "INSERT INTO job (yt_url, video_id, author_id, category_id) VALUES (?, ?, 1, 1)",
+            [('first', 'aaaaaaaaaaa'), ('second', 'bbbbbbbbbbb')])
+        db.commit()
+
+        assert claim_job() == 1
+        assert claim_job() == 2
+        assert claim_job() is None
+        assert claim_job(1) is None
+
+
+def test_claim_job_error_logged(app: Flask, caplog: Any) -> None:
+    with app.app_context():
+        db = get_db()
+        # as if the database was not initialized yet
+        db.execute('DROP TABLE job')
+
+        assert claim_job() is None
+        assert not db.in_transaction
+    assert 'Error claiming job' in caplog.text
+
+
+def test_retry_uses_cached_video_data(client: FlaskClient, auth: object, app: Flask,
+                                      mock_youtube: None, mocker: Any) -> None:
+    metadata = mocker.patch('summ.jobs.get_video_metadata',
+                            return_value=VideoMetadata(title='Test Video Title'))
+    transcript = mocker.patch('summ.jobs.fetch_transcript_segments',
+                              return_value=TranscriptSegments.from_items([{'text': 'Test'}]))
+    summarize = mocker.patch('summ.jobs.summarize_segments', side_effect=[
+        Exception('Out of memory'), [SectionSummary(0.0, 1.0, 'Test summary')]])
+    auth.login()
+    for _ in range(2):
+        client.post('/create', data={
+            'yt_url': 'https://www.youtube.com/watch?v=MGXSPf9b-xI',
+            'category_name': 2})
+
+    with app.app_context():
+        statuses = [row['status'] for row in get_db().execute(
+            'SELECT status FROM job ORDER BY id').fetchall()]
+    assert statuses == ['failed', 'done']
+
+    assert metadata.call_count == 1
+    assert transcript.call_count == 1
+    assert summarize.call_count == 2
+
+
+def test_job_condenses_sections(client: FlaskClient, auth: object, app: Flask,
+                                mock_youtube: None, mocker: Any) -> None:
+    app.config['SUMMARY_TARGET_TOKENS'] = 3
+    app.config['SUMMARY_MAX_MODEL_CALLS'] = 10
+    mocker.patch('summ.jobs.summarize_segments', return_value=[
+        SectionSummary(0.0, 5.0, 'one two'), SectionSummary(5.0, 9.0, 'three four')])
+    reduce = mocker.patch('summ.jobs.reduce_summaries', return_value=('one two three', True))
+    auth.login()
+    client.post('/create', data={
+        'yt_url': 'https://www.youtube.com/watch?v=MGXSPf9b-xI',
+        'category_name': 2})
+
+    # the section calls count against the job's model call budget
+    reduce.assert_called_once_with(['one two', 'three four'], 3, max_calls=8, batch_size=8,
+                                   max_batch_tokens=None, workers=1)
+    with app.app_context():
+        db = get_db()
+        assert db.execute('SELECT summary_text FROM summary WHERE id = 3').fetchone()[0] == \
+            'one two three'
+        assert db.execute(
+            'SELECT COUNT(*) FROM summary_section WHERE summary_id = 3').fetchone()[0] == 2
+
+
+def test_worker_survives_job_errors(app: Flask, mocker: Any) -> None:
+    with app.app_context():
+        db = get_db()
+        db.executemany(
+            "INSERT INTO job (yt_url, video_id, author_id, category_id) VALUES (?, ?, 1, 1)",
+            [('first', 'aaaaaaaaaaa'), ('second', 'bbbbbbbbbbb')])
+        db.commit()
+
+    run_job = mocker.patch('summ.jobs.run_job', side_effect=[
+        sqlite3.OperationalError('database is locked'), None])
+    workers = JobWorkers(app, 1, poll_interval=0, lease=60)
+
+    assert workers._run_once()
+    assert workers._run_once()
+    assert not workers._run_once()
+    assert [call.args for call in run_job.call_args_list] == [(1,), (2,)]
+
+
+def test_job_summary_not_stored_without_outcome(client: FlaskClient, auth: object, app: Flask,
+                                                 mock_youtube: None, mocker: Any) -> None:
+    class LockedConnection:
+        """Fail the UPDATE that records the job outcome, like a locked database."""
+
+        def __init__(self, db: sqlite3.Connection) -> None:
+            self.db = db
+
+        def execute(self, sql: str, *args: Any) -> Any:
+            if sql.startswith("UPDATE job SET status = 'done'"):
+                raise sqlite3.OperationalError('database is locked')
+            return self.db.execute(sql, *args)
+
+        def __getattr__(self, name: str) -> Any:
+            return getattr(self.db, name)
+
+    with app.app_context():
+        db = get_db()
+        db.execute("INSERT INTO job (yt_url, video_id, author_id, category_id, status)"
+                   " VALUES ('https://youtu.be/MGXSPf9b-xI', 'MGXSPf9b-xI', 1, 2, 'running')")
+        db.commit()
+        mocker.patch('summ.jobs.get_db', return_value=LockedConnection(db))
+        with pytest.raises(sqlite3.OperationalError):
+            run_job(1)
+        db.rollback()
+
+        assert db.execute('SELECT COUNT(*) FROM summary').fetchone()[0] == 2
+        assert db.execute('SELECT status FROM job WHERE id = 1').fetchone()[0] == 'running'
+
+
+def test_requeue_only_expired_jobs(app: Flask) -> None:
+    with app.app_context():
+        db = get_db()
+        db.executemany(
+            "INSERT INTO job (yt_url, video_id, author_id, category_id, status, updated_at)"
+            " VALUES (?, ?, 1, 1, 'running', datetime('now', ?))",
+            [('abandoned', 'aaaaaaaaaaa', '-5 minutes'),
+             ('live', 'bbbbbbbbbbb', '-5 minutes'),
+             ('fresh', 'ccccccccccc', '-10 seconds')])
+        db.commit()
+
+        # another live process renews the lease of its job
+        renew_jobs([2])
+        requeue_interrupted_jobs(60)
+
+        statuses = [row['status'] for row in db.execute('SELECT status FROM job ORDER BY id')]
+        assert statuses == ['queued', 'running', 'running']
@@ -4,60 +4,89 @@ from unittest.mock import patch, MagicMock
 from typing import List, Dict, Any
 
 from summ.llm import (
+    VideoMetadata,
+    get_video_metadata,
     get_youtube_title,
     get_youtube_video_channel_name,
     extract_video_id,
     get_transcript,
     get_summarizer,
+    clear_summarizers,
     text_chunking,
+    pack_units,
+    token_chunking,
+    chunk_segments,
+    make_batches,
     summarize_text,
+    summarize_segments,
+    reduce_summaries,
+    summary_cache_info,
     MODEL_NAME
 )
+from summ.cache import DiskCache
+from summ.transcript import SectionSummary, TranscriptSegments
 
 
-def test_get_youtube_title_valid() -> None:
-    with patch('requests.get') as mock_get:
-        mock_response = MagicMock()
-        mock_response.text = '<title>Test Video Title - YouTube</title>'
-        mock_get.return_value = mock_response
+def mock_page(mocker: Any, *chunks: bytes) -> MagicMock:
+    mock_response = MagicMock()
+    mock_response.encoding = 'utf-8'
+    mock_response.iter_content.return_value = list(chunks)
+    return mocker.patch('summ.llm.http_session.get', return_value=mock_response)
 
-        title = get_youtube_title('https://youtube.com/watch?v=test')
-        assert title == 'Test Video Title'
 
+def test_get_youtube_title_valid(mocker: Any) -> None:
+    mock_page(mocker, b'<title>Test Video Title - YouTube</title>')
 
-def test_get_youtube_title_error() -> None:
-    with patch('requests.get', side_effect=Exception('Network Error')):
-        title = get_youtube_title('https://youtube.com/watch?v=test')
-        assert title is None
+    title = get_youtube_title('https://youtube.com/watch?v=test')
+    assert title == 'Test Video Title'
 
 
-def test_get_youtube_video_channel_name_valid() -> None:
-    with patch('requests.get') as mock_get:
-        mock_response = MagicMock()
-        mock_response.text = '"channelName":"Test Channel"'
-        mock_get.return_value = mock_response
+def test_get_youtube_title_error(mocker: Any) -> None:
+    mocker.patch('summ.llm.http_session.get', side_effect=Exception('Network Error'))
+    title = get_youtube_title('https://youtube.com/watch?v=test')
+    assert title is None
 
-        channel_name = get_youtube_video_channel_name(
-            'https://youtube.com/watch?v=test')
-        assert channel_name == 'Test Channel'
 
+def test_get_youtube_video_channel_name_valid(mocker: Any) -> None:
+    mock_page(mocker, b'"channelName":"Test Channel"')
 
-def test_get_youtube_video_channel_name_error() -> None:
-    with patch('requests.get', side_effect=Exception('Network Error')):
-        channel_name = get_youtube_video_channel_name(
-            'https://youtube.com/watch?v=test')
-        assert channel_name is None
+    channel_name = get_youtube_video_channel_name(
+        'https://youtube.com/watch?v=test')
+    assert channel_name == 'Test Channel'
 
 
-def test_get_youtube_video_channel_name_empty() -> None:
-    with patch('requests.get') as mock_get:
-        mock_response = MagicMock()
-        mock_response.text = ''
-        mock_get.return_value = mock_response
+def test_get_youtube_video_channel_name_error(mocker: Any) -> None:
+    mocker.patch('summ.llm.http_session.get', side_effect=Exception('Network Error'))
+    channel_name = get_youtube_video_channel_name(
+        'https://youtube.com/watch?v=test')
+    assert channel_name is None
 
-        channel_name = get_youtube_video_channel_name(
-            'https://youtube.com/watch?v=test')
-        assert channel_name == 'unknown'
+
+def test_get_youtube_video_channel_name_empty(mocker: Any) -> None:
+    mock_page(mocker, b'')
+
+    channel_name = get_youtube_video_channel_name(
+        'https://youtube.com/watch?v=test')
+    assert channel_name == 'unknown'
+
+
+def test_get_video_metadata_single_streamed_fetch(mocker: Any) -> None:
+    mock_get = mock_page(
+        mocker,
+        '<title>Caf\u00e9 &amp; Talk - YouTube</title>'.encode(),
+        b'"lengthSeconds":"754","ownerChannelName":"Test',
+        b' Channel","captionTracks":[{"baseUrl":"x","languageCode":"en"}]',
+        b'never read',
+    )
+
+    metadata = get_video_metadata('https://youtube.com/watch?v=test')
+
+    assert metadata == VideoMetadata(title='Caf\u00e9 & Talk', channel_name='Test Channel',
+                                     duration=754, language='en')
+    mock_get.assert_called_once()
+    assert mock_get.call_args.kwargs['stream'] is True
+    assert mock_get.call_args.kwargs['timeout'] is not None
+    assert mock_get.return_value.close.called
 
 
 @pytest.mark.parametrize('url,expected_id', [
@@ -116,6 +145,80 @@ def test_get_summarizer_exception(mocker: Any) -> None:
     assert summarizer is None
 
 
+def test_get_summarizer_without_torch(mocker: Any) -> None:
+    clear_summarizers()
+    mocker.patch.dict('sys.modules', {'torch': None})
+
+    assert get_summarizer('some/model') is None
+
+
+def test_get_summarizer_loads_model_once(mocker: Any) -> None:
+    clear_summarizers()
+    mocker.patch('summ.llm.get_device', return_value='cpu')
+    mock_pipeline = mocker.patch('transformers.pipeline', return_value=MagicMock())
+
+    first = get_summarizer('some/model')
+    second = get_summarizer('some/model')
+
+    assert first is second
+    mock_pipeline.assert_called_once_with(
+        'summarization', model='some/model', device='cpu')
+    clear_summarizers()
+
+
+def test_get_summarizer_failure_not_cached(mocker: Any) -> None:
+    clear_summarizers()
+    mocker.patch('summ.llm.get_device', return_value='cpu')
+    mock_pipeline = mocker.patch('transformers.pipeline',
+                                 side_effect=Exception('Model loading failed'))
+
+    assert get_summarizer('some/model') is None
+    assert get_summarizer('some/model') is None
+    assert mock_pipeline.call_count == 2
+
+
+def test_get_summarizer_backends(mocker: Any) -> None:
+    clear_summarizers()
+    mocker.patch('summ.llm.get_device', return_value='cpu')
+    mock_torch = MagicMock()
+    mocker.patch.dict('sys.modules', {'torch': mock_torch})
+    mocker.patch('transformers.AutoModelForSeq2SeqLM', create=True)
+    mocker.patch('transformers.AutoTokenizer', create=True)
+    mock_pipeline = mocker.patch('transformers.pipeline', side_effect=lambda *a, **kw: MagicMock())
+
+    full = get_summarizer('some/model')
+    quantized = get_summarizer('some/model', backend='torch-int8')
+
+    assert full is not quantized
+    assert get_summarizer('some/model', backend='torch-int8') is quantized
+    assert mock_pipeline.call_count == 2
+    mock_torch.quantization.quantize_dynamic.assert_called_once()
+    assert mock_pipeline.call_args.kwargs['model'] is \
+        mock_torch.quantization.quantize_dynamic.return_value
+    clear_summarizers()
+
+
+def test_get_summarizer_onnx_needs_optimum(mocker: Any) -> None:
+    clear_summarizers()
+    mocker.patch('summ.llm.get_device', return_value='cpu')
+    mocker.patch.dict('sys.modules', {'optimum.onnxruntime': None})
+
+    assert get_summarizer('some/model', backend='onnx') is None
+    with pytest.raises(ValueError, match='Unknown summarization backend'):
+        get_summarizer('some/model', backend='tensorrt')
+
+
+def test_summarize_text_uses_given_summarizer(mocker: Any) -> None:
+    mock_summarizer = MagicMock(return_value=[{'summary_text': 'Summary'}])
+    mock_summarizer.tokenizer = None
+    get_summarizer_mock = mocker.patch('summ.llm.get_summarizer')
+
+    summary = summarize_text('Some text', summarizer=mock_summarizer)
+
+    assert summary == 'Summary'
+    get_summarizer_mock.assert_not_called()
+
+
 def test_text_chunking() -> None:
     long_text = 'a' * 2000
     chunks = text_chunking(long_text)
@@ -125,8 +228,210 @@ def test_text_chunking() -> None:
     assert len(set(chunks)) > 1
 
 
+class WordTokenizer:
+    """Tokenizer stand-in that treats every word as one token"""
+    model_max_length = 12
+
+    def __call__(self, texts: List[str], add_special_tokens: bool = True) -> Dict[str, Any]:
+        extra = [0, 0] if add_special_tokens else []
+        return {'input_ids': [text.split() + extra for text in texts]}
+
+    def num_special_tokens_to_add(self) -> int:
+        return 2
+
+    def decode(self, ids: List[str], skip_special_tokens: bool = False) -> str:
+        return ' '.join(ids)
+
+
+@pytest.mark.parametrize('lengths,max_tokens,overlap,expected', [
+    ([3, 3, 3], 10, 0, [(0, 3)]),
+    ([4, 4, 4, 4], 8, 0, [(0, 2), (2, 4)]),
+    ([2, 2, 2, 2, 2], 6, 2, [(0, 3), (2, 5)]),
+    ([9, 1], 5, 2, [(0, 1), (1, 2)]),
+])
+def test_pack_units(lengths: List[int], max_tokens: int, overlap: int,
+                    expected: List[Any]) -> None:
+    assert pack_units(lengths, max_tokens, overlap) == expected
+
+
+def test_token_chunking_fills_window_on_sentence_edges() -> None:
+    text = 'One two three. Four five six. Seven eight nine. Ten eleven twelve.'
+
+    chunks = token_chunking(text, WordTokenizer(), overlap_tokens=0)
+
+    assert chunks == ['One two three. Four five six. Seven eight nine.',
+                      'Ten eleven twelve.']
+
+
+def test_token_chunking_overlap_and_long_sentences() -> None:
+    text = ' '.join(f'w{i}' for i in range(25)) + '. Short one.'
+
+    chunks = token_chunking(text, WordTokenizer(), overlap_tokens=3)
+
+    assert all(len(chunk.split()) <= 10 for chunk in chunks)
+    assert chunks[0].split() == [f'w{i}' for i in range(10)]
+    assert chunks[-1].endswith('Short one.')
+
+
+class CharTokenizer(WordTokenizer):
+    """Tokenizer stand-in that splits words, every character is one token"""
+    model_max_length = 14
+
+    def __call__(self, texts: List[str], add_special_tokens: bool = True) -> Dict[str, Any]:
+        extra = [''] * 2 if add_special_tokens else []
+        return {'input_ids': [list(text) + extra for text in texts]}
+
+    def decode(self, ids: List[str], skip_special_tokens: bool = False) -> str:
+        return ''.join(ids)
+
+
+def test_token_chunking_unpunctuated_captions() -> None:
+    text = 'so today we are going to talk about models and attention'
+
+    chunks = token_chunking(text, CharTokenizer(), overlap_tokens=0)
+
+    # one 'sentence' of 56 characters, split between words into 12 character windows
+    assert len(chunks) > 1
+    assert ' '.join(chunks) == text
+    assert all(len(' ' + chunk) <= 12 for chunk in chunks)
+
+
+def make_segments(*texts: str) -> TranscriptSegments:
+    return TranscriptSegments.from_items(
+        {'text': text, 'start': 10.0 * i, 'duration': 5.0} for i, text in enumerate(texts))
+
+
+def test_chunk_segments_keeps_segment_edges_and_times() -> None:
+    segments = make_segments('one two three', 'four five six', 'seven eight nine', 'ten eleven')
+
+    chunks = chunk_segments(segments, WordTokenizer(), overlap_tokens=0)
+
+    assert [chunk.text for chunk in chunks] == [
+        'one two three four five six seven eight nine', 'ten eleven']
+    assert [(chunk.start, chunk.end) for chunk in chunks] == [(0.0, 25.0), (30.0, 35.0)]
+
+
+def test_chunk_segments_splits_long_segments() -> None:
+    segments = make_segments(' '.join(f'w{i}' for i in range(25)), 'short one')
+
+    chunks = chunk_segments(segments, WordTokenizer(), overlap_tokens=0)
+
+    assert all(len(chunk.text.split()) <= 10 for chunk in chunks)
+    assert chunks[0].text.split() == [f'w{i}' for i in range(10)]
+    assert (chunks[0].start, chunks[0].end) == (0.0, 5.0)
+    assert chunks[-1].text.endswith('short one')
+    assert chunks[-1].end == 15.0
+
+
+def test_chunk_segments_splits_long_segments_between_words() -> None:
+    segments = make_segments('so today we are going to talk about models')
+
+    chunks = chunk_segments(segments, CharTokenizer(), overlap_tokens=0)
+
+    assert ' '.join(chunk.text for chunk in chunks) == segments.text
+    assert all(len(' ' + chunk.text) <= 12 for chunk in chunks)
+
+
+def test_chunk_segments_without_tokenizer() -> None:
+    segments = make_segments('a b', 'c d', 'e f')
+
+    chunks = chunk_segments(segments, max_tokens=4, overlap_tokens=0)
+
+    assert [chunk.text for chunk in chunks] == ['a b c d', 'e f']
+    assert chunk_segments(make_segments()) == []
+
+
+def test_summarize_segments(mocker: Any, tmp_path: Any) -> None:
+    cache = DiskCache(str(tmp_path / 'cache.sqlite'), ttl=60, max_bytes=1024 * 1024)
+    mock_summarizer = MagicMock(side_effect=lambda inputs, **kwargs: [
+        {'summary_text': text.upper()} for text in inputs])
+    mock_summarizer.tokenizer = WordTokenizer()
+    segments = make_segments('one two three', 'four five six', 'seven eight nine', 'ten eleven')
+
+    first = summarize_segments(segments, summarizer=mock_summarizer, overlap_tokens=0,
+                               cache=cache)
+    second = summarize_segments(segments, summarizer=mock_summarizer, overlap_tokens=0,
+                                cache=cache)
+
+    assert first == second == [
+        SectionSummary(0.0, 25.0, 'ONE TWO THREE FOUR FIVE SIX SEVEN EIGHT NINE'),
+        SectionSummary(30.0, 35.0, 'TEN ELEVEN')]
+    assert mock_summarizer.call_count == 1
+
+
+def test_summarize_segments_model_error(mocker: Any) -> None:
+    mocker.patch('summ.llm.get_summarizer', return_value=None)
+
+    assert summarize_segments(make_segments('text')) is None
+
+
+def first_words(inputs: List[str], **kwargs: Any) -> List[Dict[str, str]]:
+    return [{'summary_text': ' '.join(text.split()[:2])} for text in inputs]
+
+
+def test_reduce_summaries_until_target() -> None:
+    mock_summarizer = MagicMock(side_effect=first_words)
+    mock_summarizer.tokenizer = WordTokenizer()
+    summaries = [f'a{i} b{i} c{i}' for i in range(8)]
+
+    summary, complete = reduce_summaries(summaries, mock_summarizer, target_tokens=6)
+
+    # 8 summaries fit 2 per window, then 4 and 2 halves: 'a0 b0' survives each round
+    assert complete
+    assert summary == 'a0 b0'
+    assert mock_summarizer.call_count == 3
+
+
+def test_reduce_summaries_call_cap_truncates() -> None:
+    mock_summarizer = MagicMock(side_effect=first_words)
+    mock_summarizer.tokenizer = WordTokenizer()
+    summaries = [f'a{i} b{i} c{i}' for i in range(8)]
+
+    summary, complete = reduce_summaries(summaries, mock_summarizer, target_tokens=6,
+                                         max_calls=5)
+
+    assert complete
+    # one round of 4 calls fits, the next would go over; the rest is cut to 6 words
+    assert summary == 'a0 b0 a2 b2 a4 b4'
+    assert mock_summarizer.call_count == 1
+
+
+def test_reduce_summaries_loads_model_only_when_needed() -> None:
+    mock_summarizer = MagicMock(side_effect=first_words)
+    mock_summarizer.tokenizer = WordTokenizer()
+    load = MagicMock(return_value=mock_summarizer)
+
+    summary, _ = reduce_summaries(['a b', 'c d'], None, target_tokens=8,
+                                  tokenizer=WordTokenizer(), load_summarizer=load)
+    assert summary == 'a b c d'
+    load.assert_not_called()
+
+    summaries = [f'a{i} b{i} c{i}' for i in range(8)]
+    summary, _ = reduce_summaries(summaries, None, target_tokens=6,
+                                  tokenizer=WordTokenizer(), load_summarizer=load)
+    assert summary == 'a0 b0'
+    load.assert_called_once()
+
+
+def test_summarize_text_map_reduce_parallel(mocker: Any) -> None:
+    mock_summarizer = MagicMock(side_effect=first_words)
+    mock_summarizer.tokenizer = WordTokenizer()
+    text = ' '.join(f'Sentence {i} has five words.' for i in range(12))
+
+    concat = summarize_text(text, summarizer=mock_summarizer, batch_size=1,
+                            overlap_tokens=0, workers=4)
+    reduced = summarize_text(text, summarizer=mock_summarizer, batch_size=1,
+                             overlap_tokens=0, workers=4, target_tokens=4)
+
+    assert concat == ' '.join(f'Sentence {i}' for i in range(0, 12, 2))
+    assert reduced == 'Sentence 0'
+    too_long = summarize_text(text, summarizer=mock_summarizer, overlap_tokens=0, max_calls=3)
+    assert too_long.startswith('Error: Text is too long')
+
+
 def test_summarize_text_success(mocker: Any) -> None:
     mock_summarizer = MagicMock()
+    mock_summarizer.tokenizer = None
     mock_summarizer.return_value = [{'summary_text': 'Summary'}]
 
     mocker.patch('summ.llm.get_summarizer', return_value=mock_summarizer)
@@ -146,8 +451,31 @@ def test_summarize_text_model_error(mocker: Any) -> None:
     assert summary == "Error: Could not load summarization model"
 
 
+def test_summarize_text_backend_error_no_fallback(mocker: Any, tmp_path: Any) -> None:
+    clear_summarizers()
+    cache = DiskCache(str(tmp_path / 'cache.sqlite'), ttl=60, max_bytes=1024 * 1024)
+    mocker.patch('summ.llm.get_device', return_value='cpu')
+    mocker.patch.dict('sys.modules', {'optimum.onnxruntime': None})
+    mock_pipeline = mocker.patch('transformers.pipeline', return_value=MagicMock())
+
+    summary = summarize_text('Test text', backend='onnx', cache=cache)
+
+    # the full-precision model is never loaded in place of the requested backend
+    assert summary == "Error: Could not load summarization model"
+    mock_pipeline.assert_not_called()
+
+    # and nothing was cached for the onnx backend
+    onnx_summarizer = MagicMock(return_value=[{'summary_text': 'Summary'}])
+    onnx_summarizer.tokenizer = None
+    assert summarize_text('Test text', backend='onnx', summarizer=onnx_summarizer,
+                          cache=cache) == 'Summary'
+    onnx_summarizer.assert_called_once()
+    clear_summarizers()
+
+
 def test_summarize_text_chunk_exception(mocker: Any) -> None:
     mock_summarizer = MagicMock()
+    mock_summarizer.tokenizer = None
     mocker.patch('summ.llm.get_summarizer', return_value=mock_summarizer)
     mocker.patch('summ.llm.text_chunking',
                  return_value=['test chunk'])
@@ -158,14 +486,69 @@ def test_summarize_text_chunk_exception(mocker: Any) -> None:
         result = summarize_text("Some test text")
 
         mock_summarizer.assert_called_once_with(
-            'test chunk',
-            max_length=100,
-            min_length=30,
-            do_sample=False
+            ['test chunk'],
+            batch_size=1,
+            max_length=50,
+            min_length=15,
+            do_sample=False,
+            truncation=True
         )
 
         mock_print.assert_called_once_with(
-            "Error summarizing chunk: Summarization failed"
+            "Error summarizing batch: Summarization failed"
         )
 
         assert result == ""
+
+
+@pytest.mark.parametrize('lengths,batch_size,max_batch_tokens,expected', [
+    ([5, 1, 3, 2], 2, None, [[1, 3], [2, 0]]),
+    ([5, 1, 3, 2], 8, None, [[1, 3, 2, 0]]),
+    ([5, 1, 3, 2], 8, 6, [[1, 3], [2], [0]]),
+    ([], 8, None, []),
+])
+def test_make_batches(lengths: List[int], batch_size: int, max_batch_tokens: Any,
+                      expected: List[List[int]]) -> None:
+    assert make_batches(lengths, batch_size, max_batch_tokens) == expected
+
+
+def test_summarize_text_batches_keep_order(mocker: Any) -> None:
+    mocker.patch('summ.llm.text_chunking',
+                 return_value=['ccc ccc ccc', 'a', 'bb bb'])
+    mock_summarizer = MagicMock(side_effect=lambda inputs, **kwargs: [
+        {'summary_text': text.split()[0]} for text in inputs])
+    mock_summarizer.tokenizer = None
+
+    result = summarize_text('text', summarizer=mock_summarizer, batch_size=2)
+
+    assert result == 'ccc a bb'
+    assert mock_summarizer.call_count == 2
+
+
+def test_summarize_text_cache(mocker: Any, tmp_path: Any) -> None:
+    cache = DiskCache(str(tmp_path / 'cache.sqlite'), ttl=60, max_bytes=1024 * 1024)
+    mock_summarizer = MagicMock(return_value=[{'summary_text': 'Summary'}])
+    mock_summarizer.tokenizer = None
+    before = summary_cache_info()
+
+    first = summarize_text('Some text', summarizer=mock_summarizer, cache=cache)
+    second = summarize_text('Some text', summarizer=mock_summarizer, cache=cache)
+    other = summarize_text('Some text', max_length=80,
+                           summarizer=mock_summarizer, cache=cache)
+
+    assert first == second == other == 'Summary'
+    assert mock_summarizer.call_count == 2
+    after = summary_cache_info()
+    assert after.hits - before.hits == 1
+    assert after.misses - before.misses == 2
+
+
+def test_summarize_text_cache_skips_failures(mocker: Any, tmp_path: Any) -> None:
+    cache = DiskCache(str(tmp_path / 'cache.sqlite'), ttl=60, max_bytes=1024 * 1024)
+    mock_summarizer = MagicMock(side_effect=Exception('Summarization failed'))
+    mock_summarizer.tokenizer = None
+
+    summarize_text('Some text', summarizer=mock_summarizer, cache=cache)
+    summarize_text('Some text', summarizer=mock_summarizer, cache=cache)
+
+    assert mock_summarizer.call_count == 2
@@ -1,8 +1,10 @@
 import pytest
 from flask import Flask
 from flask.testing import FlaskClient
-from summ.db import get_db
-from typing import Any
+from markupsafe import escape
+from summ.db import compress_text, get_db
+from summ.summary import invalidate_categories, templates_digest
+from typing import Any, List
 
 
 def test_index(client: FlaskClient, auth: object) -> None:
@@ -22,6 +24,71 @@ def test_index(client: FlaskClient, auth: object) -> None:
     assert b'Favorite' in response.data
 
 
+def test_index_favorite_flags(client: FlaskClient, auth: object, trace_sql: Any) -> None:
+    auth.login('other', 'other')
+
+    with trace_sql() as statements:
+        response = client.get('/')
+
+    # 'other' favorited summary 1 only
+    assert b'action="/unfavorite/1"' in response.data
+    assert b'action="/favorite/2"' in response.data
+    assert not any('user_favorite_summary WHERE' in statement for statement in statements)
+    assert sum('FROM category' in statement for statement in statements) == 1
+
+
+def test_categories_cached_across_requests(client: FlaskClient, trace_sql: Any) -> None:
+    client.get('/')
+
+    with trace_sql() as statements:
+        client.get('/')
+
+    # the version counters, read once for the page's ETag and also checked
+    # against the cached categories, then the listing itself
+    assert len(statements) == 2
+    assert statements[0] == 'SELECT name, version FROM cache_version'
+    assert not any('FROM category' in s for s in statements)
+
+
+def test_categories_follow_version(client: FlaskClient, app: Flask) -> None:
+    app.extensions['summ.categories'].ttl = 0
+    assert b'Science' in client.get('/').data
+
+    # as if another process renamed it, this one only sees the version change
+    with app.app_context():
+        db = get_db()
+        db.execute("UPDATE category SET category_name = 'Physics' WHERE id = 2")
+        db.commit()
+
+    response = client.get('/')
+    assert b'Physics' in response.data
+    assert b'Science' not in response.data
+
+
+def test_categories_invalidate(client: FlaskClient, auth: object, app: Flask) -> None:
+    # the create page relies on the ttl, unlike the index it doesn't read the version itself
+    auth.login()
+    client.get('/create')
+    with app.app_context():
+        db = get_db()
+        db.execute("INSERT INTO category (category_name) VALUES ('Music')")
+        db.commit()
+        assert b'Music' not in client.get('/create').data
+
+        invalidate_categories()
+    assert b'Music' in client.get('/create').data
+
+
+def test_index_categories_follow_version_at_once(client: FlaskClient, app: Flask) -> None:
+    client.get('/')
+    with app.app_context():
+        db = get_db()
+        db.execute("INSERT INTO category (category_name) VALUES ('Music')")
+        db.commit()
+
+    assert b'Music' in client.get('/').data
+
+
 def test_index_route_with_category_filter(client: FlaskClient):
     response = client.get('/?category=Music')
     assert response.status_code == 200
@@ -32,10 +99,140 @@ def test_index_route_with_search_query(client: FlaskClient):
     assert response.status_code == 200
 
 
+def test_index_pagination(client: FlaskClient, app: Flask) -> None:
+    app.config['INDEX_PAGE_SIZE'] = 1
+
+    response = client.get('/')
+    assert b'cNsTMNxOzqQ' in response.data
+    assert b'dQw4w9WgXcQ' not in response.data
+    assert b'before=2024-11-12+00:00:00,2' in response.data
+
+    response = client.get('/?before=2024-11-12+00:00:00,2')
+    assert b'cNsTMNxOzqQ' not in response.data
+    assert b'dQw4w9WgXcQ' in response.data
+    assert b'before=' not in response.data
+
+
+@pytest.mark.parametrize('cursor', ('garbage', 'x,\u00b2', 'x,99999999999999999999999'))
+def test_index_invalid_cursor(client: FlaskClient, cursor: str) -> None:
+    response = client.get('/', query_string={'before': cursor})
+    assert response.status_code == 200
+    assert b'dQw4w9WgXcQ' in response.data
+
+
+def test_index_full_text_search(client: FlaskClient) -> None:
+    response = client.get('/?search=transcript2')
+    assert b'cNsTMNxOzqQ' in response.data
+    assert b'dQw4w9WgXcQ' not in response.data
+    assert b'fake <mark>transcript2</mark>' in response.data
+
+    response = client.get('/?search=RLM')
+    assert b'dQw4w9WgXcQ' in response.data
+    assert b'cNsTMNxOzqQ' not in response.data
+
+
+def test_index_search_ranking_and_paging(client: FlaskClient, app: Flask) -> None:
+    app.config['INDEX_PAGE_SIZE'] = 1
+    with app.app_context():
+        db = get_db()
+        db.execute("UPDATE summary SET summary_text = 'about PT' WHERE id = 1")
+        db.commit()
+
+    # a channel match outranks a summary match
+    response = client.get('/?search=PT')
+    assert b'cNsTMNxOzqQ' in response.data
+    assert b'page=2' in response.data
+
+    response = client.get('/?search=PT&page=2')
+    assert b'dQw4w9WgXcQ' in response.data
+    assert b'page=3' not in response.data
+
+
+def test_index_search_snippets_only_for_page(client: FlaskClient, app: Flask,
+                                             trace_sql: Any) -> None:
+    app.config['INDEX_PAGE_SIZE'] = 1
+    with trace_sql() as statements:
+        response = client.get('/?search=fake')
+
+    assert b'<mark>fake</mark>' in response.data
+    ranking = [s for s in statements if 'bm25' in s]
+    assert len(ranking) == 1 and 'snippet' not in ranking[0]
+    snippets = [s for s in statements if 'snippet' in s]
+    assert len(snippets) == 1 and 'rowid IN (2)' in snippets[0]
+
+
+@pytest.mark.parametrize('page', ('0', '-3', '99999999999999999999'))
+def test_index_search_page_out_of_range(client: FlaskClient, page: str) -> None:
+    response = client.get(f'/?search=fake&page={page}')
+    assert response.status_code == 200
+    assert b'dQw4w9WgXcQ' in response.data
+
+
+def test_index_search_escapes_input(client: FlaskClient) -> None:
+    response = client.get('/?search=%22fake%22%20OR%20NEAR(%2A')
+    assert response.status_code == 200
+
+
+@pytest.mark.parametrize('search', ('%00', 'fa%00ke', '%01%02%03'))
+def test_index_search_control_characters(client: FlaskClient, search: str) -> None:
+    response = client.get(f'/?search={search}')
+    assert response.status_code == 200
+
+
+def test_search_index_follows_changes(app: Flask) -> None:
+    with app.app_context():
+        db = get_db()
+        db.execute("UPDATE summary SET yt_title = 'renamed video' WHERE id = 1")
+        db.execute('DELETE FROM summary WHERE id = 2')
+        db.commit()
+
+        def matches(term: str) -> List[int]:
+            return [row[0] for row in db.execute(
+                'SELECT rowid FROM summary_fts WHERE summary_fts MATCH ?', (term,))]
+
+        assert matches('renamed') == [1]
+        assert matches('title2') == []
+        assert matches('transcript2') == []
+
+
 def test_detail(client: FlaskClient):
     response = client.get('/detail/1')
     assert response.status_code == 200
     assert b'Summary Details' in response.data
+    assert b'fake transcript' in response.data
+
+
+def test_detail_consumes_flashed_messages(client: FlaskClient) -> None:
+    with client.session_transaction() as session:
+        session['_flashes'] = [('message', 'Flashed once')]
+
+    assert b'Flashed once' in client.get('/detail/1').data
+    assert b'Flashed once' not in client.get('/').data
+
+
+def test_detail_sections(client: FlaskClient) -> None:
+    response = client.get('/detail/1')
+    assert b'fake section2' in response.data
+    assert b'1:30 &ndash; 1:02:05' in response.data
+    assert b'watch?v=dQw4w9WgXcQ&amp;t=90s' in response.data
+
+    # a single section would only repeat the summary
+    assert b'Sections' not in client.get('/detail/2').data
+
+
+def test_detail_streams_long_transcript(client: FlaskClient, app: Flask) -> None:
+    transcript = ' '.join(f'word{i} &' for i in range(50000))
+    with app.app_context():
+        db = get_db()
+        db.execute('UPDATE summary_transcript SET body = ? WHERE summary_id = 1',
+                   (compress_text(transcript),))
+        db.commit()
+
+    response = client.get('/detail/1')
+
+    assert response.is_streamed
+    assert response.status_code == 200
+    assert str(escape(transcript)).encode() in response.data
 
 
 def test_detail_nonexisting_summary(client: FlaskClient):
@@ -131,9 +328,9 @@ def test_create_summary_duplicate_title(client: FlaskClient, auth: object, app:
         }, follow_redirects=True)
 
         db.execute(
-            'INSERT INTO summary (yt_title, yt_url, summary_text, transcript, yt_channel_name, author_id, category_id) VALUES (?, ?, ?, ?, ?, ?, ?)',
+            'INSERT INTO summary (yt_title, yt_url, summary_text, yt_channel_name, author_id, category_id) VALUES (?, ?, ?, ?, ?, ?)',
             ('Test Video Title', 'https://youtube.com/watch?v=existing', 'Existing summary',
-                'Existing transcript', 'Test Channel', 1, 1)
+                'Test Channel', 1, 1)
         )
         db.commit()
 
@@ -250,3 +447,78 @@ def test_favorites_unauthorized(client):
 
     assert response.status_code == 302
     assert response.headers["Location"] == "/auth/login"
+
+
+@pytest.mark.parametrize('path', ('/', '/detail/1', '/favorites'))
+def test_conditional_get(client: FlaskClient, auth: object, path: str) -> None:
+    auth.login()
+    response = client.get(path)
+    etag = response.headers['ETag']
+    assert response.headers['Cache-Control'] == 'private, no-cache'
+
+    response = client.get(path, headers={'If-None-Match': etag})
+    assert response.status_code == 304
+    assert response.headers['ETag'] == etag
+    assert response.data == b''
+
+
+def test_detail_not_modified_reads_only_version(client: FlaskClient, trace_sql: Any) -> None:
+    etag = client.get('/detail/1').headers['ETag']
+    with trace_sql() as statements:
+        response = client.get('/detail/1', headers={'If-None-Match': etag})
+
+    assert response.status_code == 304
+    assert statements == ['SELECT version FROM summary WHERE id = 1',
+                          'SELECT name, version FROM cache_version']
+
+
+def test_detail_etag_follows_update(client: FlaskClient, auth: object) -> None:
+    auth.login()
+    etag = client.get('/detail/1').headers['ETag']
+    client.post('/update/1', data={'yt_title': 'updated', 'yt_channel_name': 'c',
+                                   'summary_text': 's', 'category_name': '1'})
+
+    response = client.get('/detail/1', headers={'If-None-Match': etag})
+    assert response.status_code == 200
+    assert response.headers['ETag'] != etag
+
+
+def test_index_etag_follows_favorites(client: FlaskClient, auth: object, app: Flask) -> None:
+    auth.login()
+    etag = client.get('/').headers['ETag']
+    with app.app_context():
+        db = get_db()
+        db.execute('DELETE FROM user_favorite_summary WHERE user_id = 1')
+        db.commit()
+
+    assert client.get('/', headers={'If-None-Match': etag}).status_code == 200
+
+
+def test_etag_per_user(client: FlaskClient, auth: object) -> None:
+    anonymous = client.get('/')
+    assert anonymous.headers['Cache-Control'] == 'public, no-cache'
+
+    auth.login()
+    response = client.get('/', headers={'If-None-Match': anonymous.headers['ETag']})
+    assert response.status_code == 200
+    assert response.headers['ETag'] != anonymous.headers['ETag']
+
+
+def test_etag_changes_with_release(client: FlaskClient, app: Flask) -> None:
+    assert app.extensions['summ.etag_salt'] == templates_digest(app)
+    etag = client.get('/').headers['ETag']
+
+    # as if a deploy changed the templates, or PAGE_ETAG_SALT
+    app.extensions['summ.etag_salt'] = 'release-2'
+    response = client.get('/', headers={'If-None-Match': etag})
+    assert response.status_code == 200
+    assert response.headers['ETag'] != etag
+
+
+def test_no_etag_with_flashed_messages(client: FlaskClient) -> None:
+    with client.session_transaction() as session:
+        session['_flashes'] = [('message', 'Hello')]
+
+    response = client.get('/')
+    assert b'Hello' in response.data
+    assert 'ETag' not in response.headers
@@ -0,0 +1,42 @@
+import pytest
+
+from summ.transcript import TranscriptSegments, format_timestamp
+
+
+ITEMS = [
+    {'text': 'Hello there', 'start': 0.0, 'duration': 1.5},
+    {'text': 'général', 'start': 1.5, 'duration': 2.25},
+    {'text': 'Kenobi', 'start': 3.75, 'duration': 1.0},
+]
+
+
+def test_segments_share_one_text_buffer() -> None:
+    segments = TranscriptSegments.from_items(ITEMS)
+
+    assert len(segments) == 3
+    assert segments.text == 'Hello there général Kenobi'
+    assert [segments.segment_text(i) for i in range(3)] == [item['text'] for item in ITEMS]
+    assert segments.span_text(1, 2) == 'général Kenobi'
+    assert segments.time_range(0, 1) == (0.0, 3.75)
+
+
+@pytest.mark.parametrize('items', [ITEMS, []])
+def test_segments_round_trip(items: list) -> None:
+    segments = TranscriptSegments.from_items(items)
+
+    for restored in (TranscriptSegments.from_bytes(segments.text, segments.timings_to_bytes()),
+                     TranscriptSegments.from_dict(segments.to_dict())):
+        assert restored.text == segments.text
+        assert restored.offsets == segments.offsets
+        assert restored.starts == segments.starts
+        assert restored.durations == segments.durations
+
+
+@pytest.mark.parametrize('seconds,expected', [
+    (0, '0:00'),
+    (95.5, '1:35'),
+    (3725, '1:02:05'),
+    (None, '0:00'),
+])
+def test_format_timestamp(seconds: float, expected: str) -> None:
+    assert format_timestamp(seconds) == expected